@@ -0,0 +1,395 @@
+"""Live cohort analytics of survey results.
+
+Every submission updates fixed-size aggregates for its cohort (e.g. a
+school or class code sent with the answers) and for "all": counters of
+the two-digit code shown, the three-digit codes and the matched
+industries, running mean/variance of each category score (Welford), and
+a histogram per category. Updates are O(1) and reads cost the same no
+matter how many submissions a cohort has.
+
+Aggregates are kept per process and snapshotted periodically to
+<directory>/analytics-<pid>-<token>.json. A report merges this process's
+live aggregates with the latest snapshots of every other process,
+current or past, so multi-worker deployments and restarts see the whole
+picture (within one snapshot interval). Snapshots of exited processes
+are folded into <directory>/analytics-rollup.json by the snapshot
+thread, so a report reads one file per live process plus the rollup,
+however many workers have come and gone.
+"""
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; snapshots of exited processes are then kept as they are
+    fcntl = None
+
+from app.database.catalog import CATEGORIES
+from app.database.codes import rank_signature, resolve
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_DIR = os.getenv(
+    "ONTRACK_ANALYTICS_DIR",
+    str(Path(__file__).resolve().parent / "data" / "analytics")
+)
+DEFAULT_SNAPSHOT_INTERVAL = float(os.getenv("ONTRACK_ANALYTICS_SNAPSHOT_INTERVAL", 30))
+# Cohort names come from clients, so their number and length are capped
+DEFAULT_MAX_COHORTS = int(os.getenv("ONTRACK_ANALYTICS_MAX_COHORTS", 1000))
+MAX_COHORT_LENGTH = 64
+
+ALL_COHORT = "all"
+# Histogram buckets per category score: 0, 1, ..., with the last one open-ended
+HISTOGRAM_BUCKETS = 16
+SNAPSHOT_FORMAT = 1
+ROLLUP_NAME = "analytics-rollup.json"
+LOCK_NAME = "analytics.lock"
+
+# Shown two-digit code, three-digit codes and industry names of one result
+Profile = Tuple[str, Tuple[str, ...], Tuple[str, ...]]
+
+
+class CohortStats:
+    """Mergeable aggregates of the results of one cohort"""
+    __slots__ = ('n', 'mean', 'm2', 'histograms', 'two_digit', 'three_digit', 'industries')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = [0.0] * len(CATEGORIES)
+        self.m2 = [0.0] * len(CATEGORIES)
+        self.histograms = [[0] * HISTOGRAM_BUCKETS for _ in CATEGORIES]
+        self.two_digit = Counter()
+        self.three_digit = Counter()
+        self.industries = Counter()
+
+    def add(self, counts: Tuple[int, ...], profile: Profile):
+        self.n += 1
+        for idx, count in enumerate(counts):
+            delta = count - self.mean[idx]
+            self.mean[idx] += delta / self.n
+            self.m2[idx] += delta * (count - self.mean[idx])
+            self.histograms[idx][min(count, HISTOGRAM_BUCKETS - 1)] += 1
+        two_digit, three_digit, industries = profile
+        self.two_digit[two_digit] += 1
+        self.three_digit.update(three_digit)
+        self.industries.update(industries)
+
+    def merge(self, other: "CohortStats"):
+        """Combine with another cohort's aggregates (Chan et al. for the variance)"""
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        for idx in range(len(CATEGORIES)):
+            delta = other.mean[idx] - self.mean[idx]
+            self.mean[idx] += delta * other.n / n
+            self.m2[idx] += other.m2[idx] + delta * delta * self.n * other.n / n
+            for bucket, count in enumerate(other.histograms[idx]):
+                self.histograms[idx][bucket] += count
+        self.n = n
+        self.two_digit.update(other.two_digit)
+        self.three_digit.update(other.three_digit)
+        self.industries.update(other.industries)
+
+    def to_dict(self) -> Dict:
+        return {
+            "n": self.n,
+            "mean": self.mean,
+            "m2": self.m2,
+            "histograms": self.histograms,
+            "two_digit": dict(self.two_digit),
+            "three_digit": dict(self.three_digit),
+            "industries": dict(self.industries)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CohortStats":
+        stats = cls()
+        stats.n = data["n"]
+        stats.mean = list(data["mean"])
+        stats.m2 = list(data["m2"])
+        stats.histograms = [list(histogram) for histogram in data["histograms"]]
+        stats.two_digit = Counter(data["two_digit"])
+        stats.three_digit = Counter(data["three_digit"])
+        stats.industries = Counter(data["industries"])
+        return stats
+
+    def summary(self) -> Dict:
+        """Report of the aggregates, most frequent codes and industries first"""
+        return {
+            "submissions": self.n,
+            "scores": {
+                category: {
+                    "mean": round(self.mean[idx], 4),
+                    "variance": round(self.m2[idx] / self.n, 4) if self.n else 0.0,
+                    "histogram": self.histograms[idx]
+                }
+                for idx, category in enumerate(CATEGORIES)
+            },
+            "twoDigitCodes": dict(self.two_digit.most_common()),
+            "threeDigitCodes": dict(self.three_digit.most_common()),
+            "industries": dict(self.industries.most_common())
+        }
+
+
+class Analytics:
+    """Per-process cohort aggregates with periodic snapshots to disk"""
+
+    def __init__(
+        self,
+        directory: Optional[str] = DEFAULT_ANALYTICS_DIR,
+        snapshot_interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+        max_cohorts: int = DEFAULT_MAX_COHORTS
+    ):
+        # An empty directory keeps the aggregates in memory only
+        self.directory = Path(directory) if directory else None
+        self.snapshot_interval = snapshot_interval
+        self.max_cohorts = max_cohorts
+        self._lock = threading.Lock()
+        self._cohorts: Dict[str, CohortStats] = {}
+        self._profiles: Dict[Tuple[int, Tuple[int, ...]], Profile] = {}
+        self._profiles_version: Optional[int] = None
+        self._dirty = False
+        # Results of new cohorts past max_cohorts, which only count towards "all"
+        self.dropped = 0
+        self._pid: Optional[int] = None
+        self._snapshot_path: Optional[Path] = None
+        # Other processes' snapshots: path -> (mtime, cohorts, dropped, files a rollup absorbed)
+        self._peers: Dict[Path, Tuple[float, Dict[str, CohortStats], int, Tuple[str, ...]]] = {}
+        self._peers_lock = threading.Lock()
+
+    def record(self, catalog, counts: Tuple[int, ...], cohort: Optional[str] = None):
+        """Add one result to "all" and to its cohort"""
+        self._ensure_started()
+        profile = self._profile(catalog, counts)
+        with self._lock:
+            self._stats(ALL_COHORT).add(counts, profile)
+            if cohort and cohort != ALL_COHORT:
+                stats = self._stats(cohort)
+                if stats is not None:
+                    stats.add(counts, profile)
+                else:
+                    if not self.dropped:
+                        logger.warning(
+                            "Analytics cohort limit of %d reached; new cohorts only count towards %r",
+                            self.max_cohorts, ALL_COHORT
+                        )
+                    self.dropped += 1
+            self._dirty = True
+
+    def _stats(self, cohort: str) -> Optional[CohortStats]:
+        stats = self._cohorts.get(cohort)
+        if stats is None:
+            if len(self._cohorts) >= self.max_cohorts:
+                return None
+            stats = self._cohorts[cohort] = CohortStats()
+        return stats
+
+    def _profile(self, catalog, counts: Tuple[int, ...]) -> Profile:
+        """What a result shows for these counts, memoized per tie pattern"""
+        if self._profiles_version != catalog.version:
+            self._profiles = {}
+            self._profiles_version = catalog.version
+        key = (catalog.version, rank_signature(counts))
+        profile = self._profiles.get(key)
+        if profile is None:
+            resolution = resolve(counts)
+            industries = catalog.db.catalog.industry_insights(list(resolution.three_digit_codes))
+            profile = (
+                resolution.two_digit_codes[0],
+                resolution.three_digit_codes,
+                tuple(insight["industry"] for insight in industries)
+            )
+            self._profiles[key] = profile
+        return profile
+
+    def report(self, cohort: str = ALL_COHORT) -> Optional[Dict]:
+        """Merged aggregates of a cohort across processes, or None if unknown.
+
+        Reads changed snapshot files, so call it off the event loop.
+        """
+        merged = CohortStats()
+        found = False
+        names = set()
+        dropped = 0
+        for cohorts, peer_dropped in self._peer_snapshots():
+            names.update(cohorts)
+            dropped += peer_dropped
+            if cohort in cohorts:
+                merged.merge(cohorts[cohort])
+                found = True
+        with self._lock:
+            names.update(self._cohorts)
+            dropped += self.dropped
+            own = self._cohorts.get(cohort)
+            if own is not None:
+                merged.merge(own)
+                found = True
+        if not found and cohort != ALL_COHORT:
+            return None
+        names.discard(ALL_COHORT)
+        return {"cohort": cohort, **merged.summary(), "cohorts": sorted(names), "droppedCohortResults": dropped}
+
+    def status(self) -> Dict:
+        """This process's cohort count against the cap, for /health"""
+        return {"cohorts": len(self._cohorts), "max_cohorts": self.max_cohorts, "dropped": self.dropped}
+
+    def _peer_snapshots(self) -> List[Tuple[Dict[str, CohortStats], int]]:
+        """Latest snapshots of other processes, re-read only when they change"""
+        if self.directory is None or not self.directory.exists():
+            return []
+        snapshots = {}
+        absorbed = set()
+        # Reports run concurrently on the threadpool; record() doesn't wait on this lock
+        with self._peers_lock:
+            for path in self.directory.glob("analytics-*.json"):
+                if path == self._snapshot_path:
+                    continue
+                try:
+                    mtime = path.stat().st_mtime
+                    cached = self._peers.get(path)
+                    if cached is None or cached[0] != mtime:
+                        cached = self._peers[path] = (mtime, *_read_snapshot(path))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Skipping analytics snapshot %s: %s", path, e)
+                    continue
+                snapshots[path] = cached[1:3]
+                absorbed.update(cached[3])
+            for path in list(self._peers):
+                if path not in snapshots:
+                    del self._peers[path]
+        # Files already folded into the rollup but not yet deleted are counted there
+        return [snapshot for path, snapshot in snapshots.items() if path.name not in absorbed]
+
+    def compact(self):
+        """Fold the snapshots of exited processes into the rollup file.
+
+        Snapshot files are only ever deleted after the rollup lists them as
+        absorbed, so a report never counts a process twice. The directory
+        must not be shared between hosts, as liveness is checked by pid.
+        """
+        if fcntl is None or self.directory is None or not self.directory.exists():
+            return
+        with open(self.directory / LOCK_NAME, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            rollup_path = self.directory / ROLLUP_NAME
+            try:
+                cohorts, dropped, absorbed = _read_snapshot(rollup_path)
+            except FileNotFoundError:
+                cohorts, dropped, absorbed = {}, 0, ()
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Not compacting analytics: unreadable rollup %s: %s", rollup_path, e)
+                return
+            # Absorbed by an earlier compaction that stopped before deleting them
+            for name in absorbed:
+                (self.directory / name).unlink(missing_ok=True)
+
+            dead = []
+            for path in self.directory.glob("analytics-*.json"):
+                pid = _snapshot_pid(path)
+                if pid is None or path == self._snapshot_path or _is_running(pid):
+                    continue
+                try:
+                    peer, peer_dropped, _ = _read_snapshot(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Not compacting analytics snapshot %s: %s", path, e)
+                    continue
+                for name, stats in peer.items():
+                    cohorts.setdefault(name, CohortStats()).merge(stats)
+                dropped += peer_dropped
+                dead.append(path)
+            if not dead:
+                return
+
+            data = {
+                "format": SNAPSHOT_FORMAT,
+                "written_at": time.time(),
+                "cohorts": {name: stats.to_dict() for name, stats in cohorts.items()},
+                "dropped": dropped,
+                "absorbed": [path.name for path in dead]
+            }
+            _write_json(rollup_path, data)
+            for path in dead:
+                path.unlink(missing_ok=True)
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so a forked worker starts its own snapshotter
+        if self._pid == os.getpid() or self.directory is None:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker starts from empty aggregates under its own file
+            self._cohorts = {}
+            self.dropped = 0
+            self._pid = os.getpid()
+            self._snapshot_path = self.directory / f"analytics-{self._pid}-{secrets.token_hex(4)}.json"
+        threading.Thread(target=self._run, name="analytics-snapshot", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            try:
+                self.snapshot()
+                self.compact()
+            except Exception:
+                logger.exception("Could not snapshot analytics")
+
+    def snapshot(self):
+        """Write this process's aggregates to its snapshot file, if they changed"""
+        if self._snapshot_path is None or self._pid != os.getpid():
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "format": SNAPSHOT_FORMAT,
+                "written_at": time.time(),
+                "cohorts": {name: stats.to_dict() for name, stats in self._cohorts.items()},
+                "dropped": self.dropped
+            }
+            self._dirty = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_json(self._snapshot_path, data)
+
+
+def _read_snapshot(path: Path) -> Tuple[Dict[str, CohortStats], int, Tuple[str, ...]]:
+    """Cohorts and dropped results of a snapshot or rollup file, and the files a rollup absorbed"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"unknown format {data.get('format')!r}")
+    cohorts = {name: CohortStats.from_dict(stats) for name, stats in data["cohorts"].items()}
+    return cohorts, data.get("dropped", 0), tuple(data.get("absorbed", ()))
+
+
+def _write_json(path: Path, data: Dict):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _snapshot_pid(path: Path) -> Optional[int]:
+    """Pid in a per-process snapshot name (analytics-<pid>-<token>.json)"""
+    parts = path.stem.split("-")
+    if len(parts) != 3 or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, under another user
+        return True
+    return True
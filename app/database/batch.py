@@ -0,0 +1,100 @@
+import base64
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.database.catalog import CATEGORIES, Catalog
+
+# Bytes accepted as a "yes" answer in bitstring sheets
+_YES_BYTES = (ord('1'), ord('Y'), ord('y'))
+
+
+def category_matrix(catalog: Catalog) -> np.ndarray:
+    """(questions x 6) one-hot matrix of each question's category"""
+    index = np.frombuffer(catalog.category_index, dtype=np.int8).astype(np.int64)
+    matrix = np.zeros((len(index), len(CATEGORIES)), dtype=np.int32)
+    known = index >= 0
+    matrix[np.nonzero(known)[0], index[known]] = 1
+    return matrix
+
+
+def answers_to_matrix(answers: List[List[str]], num_questions: int) -> np.ndarray:
+    """Boolean (N x questions) matrix from Yes/No answer lists"""
+    matrix = np.zeros((len(answers), num_questions), dtype=bool)
+    for row, sheet in enumerate(answers):
+        for col, answer in enumerate(sheet[:num_questions]):
+            matrix[row, col] = answer.lower() == 'yes'
+    return matrix
+
+
+def bitstrings_to_matrix(bitstrings: List[str], num_questions: int) -> np.ndarray:
+    """Boolean (N x questions) matrix from strings such as "1011..." or "YNYY..."
+
+    Shorter strings are padded with "no" answers and longer ones truncated,
+    matching how the single submit endpoint treats answer lists.
+    """
+    buffer = b''.join(
+        sheet.encode('ascii', 'replace')[:num_questions].ljust(num_questions, b'0')
+        for sheet in bitstrings
+    )
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(len(bitstrings), num_questions)
+    return np.isin(raw, _YES_BYTES)
+
+
+def packed_to_matrix(packed: str, count: int, num_questions: int) -> np.ndarray:
+    """Boolean (N x questions) matrix from base64 of row-wise np.packbits output.
+
+    Each sheet occupies ceil(questions / 8) bytes, most significant bit first.
+    """
+    row_bytes = (num_questions + 7) // 8
+    raw = np.frombuffer(base64.b64decode(packed, validate=True), dtype=np.uint8)
+    if raw.size != count * row_bytes:
+        raise ValueError(
+            f"Packed payload has {raw.size} bytes, expected {count * row_bytes} "
+            f"for {count} sheets of {num_questions} questions"
+        )
+    bits = np.unpackbits(raw.reshape(count, row_bytes), axis=1)
+    return bits[:, :num_questions].astype(bool)
+
+
+def score_matrix(matrix: np.ndarray, catalog: Catalog) -> np.ndarray:
+    """(N x 6) per-category counts for a boolean answer matrix"""
+    return matrix.astype(np.int32) @ category_matrix(catalog)
+
+
+def unique_counts(counts: np.ndarray) -> Tuple[List[Tuple[int, ...]], np.ndarray]:
+    """Distinct count vectors and, for each sheet, the index of its vector"""
+    if len(counts) == 0:
+        return [], np.zeros(0, dtype=np.int64)
+
+    # Pack each row into one integer so uniqueness is a 1-D sort
+    base = int(counts.max()) + 1
+    weights = base ** np.arange(counts.shape[1], dtype=np.int64)
+    keys, inverse = np.unique(counts.astype(np.int64) @ weights, return_inverse=True)
+    vectors = [
+        tuple(int(key) // int(weight) % base for weight in weights)
+        for key in keys
+    ]
+    return vectors, inverse.reshape(-1)
+
+
+def build_matrix(
+    catalog: Catalog,
+    answers: Optional[List[List[str]]] = None,
+    bitstrings: Optional[List[str]] = None,
+    packed: Optional[str] = None,
+    count: Optional[int] = None
+) -> np.ndarray:
+    """Decode exactly one of the supported batch encodings"""
+    provided = [value is not None for value in (answers, bitstrings, packed)]
+    if sum(provided) != 1:
+        raise ValueError("Provide exactly one of 'answers', 'bitstrings' or 'packed'")
+
+    num_questions = len(catalog.questions)
+    if answers is not None:
+        return answers_to_matrix(answers, num_questions)
+    if bitstrings is not None:
+        return bitstrings_to_matrix(bitstrings, num_questions)
+    if count is None:
+        raise ValueError("'count' is required with 'packed'")
+    return packed_to_matrix(packed, count, num_questions)
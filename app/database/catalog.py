@@ -0,0 +1,312 @@
+import sys
+from array import array
+from itertools import permutations
+from typing import Any, Dict, List, Optional, Tuple
+
+# Holland (RIASEC) categories in the order used throughout the API
+CATEGORIES = ('R', 'I', 'A', 'S', 'E', 'C')
+CATEGORY_INDEX = {cat: idx for idx, cat in enumerate(CATEGORIES)}
+
+# Every three-letter Holland code that can be generated from a score vector
+THREE_DIGIT_CODES = tuple(''.join(combo) for combo in permutations(CATEGORIES, 3))
+
+# Weight of a letter by its position in a three-letter code
+CODE_POSITION_WEIGHTS = (3, 2, 1)
+
+# Column name variants accepted for each Industry Insight field
+INDUSTRY_COLUMNS = {
+    'mapping': ['Three digital', 'Three Digital', 'Mapping Code'],
+    'industry': ['Industry', 'industry'],
+    'overview': ['Overview', 'overview'],
+    'trending': ['Trending', 'trending'],
+    'insight': ['Insight', 'insight'],
+    'skills': ['Required Skills', 'Required Skill', 'required skills'],
+    'role': ['Example Role', 'Example role', 'example role'],
+    'jupas': ['Jupas', 'JUPAS', 'jupas']
+}
+
+
+def _first(row: Dict[str, Any], names: List[str], default: Any = '') -> Any:
+    """Return the first non-empty value found under any of the given column names"""
+    for name in names:
+        value = row.get(name)
+        if value is not None and value != '':
+            return value
+    return default
+
+
+def _split(value: Any, sep: str = "//") -> Tuple[str, ...]:
+    """Split a delimited cell into a tuple of stripped, non-empty items"""
+    if value is None:
+        return ()
+    return tuple(item.strip() for item in str(value).split(sep) if item.strip())
+
+
+def code_weights(codes) -> Tuple[float, ...]:
+    """Average per-category weight of a set of three-letter Holland codes"""
+    weights = [0.0] * len(CATEGORIES)
+    valid = [code for code in codes if len(code) == 3 and all(ch in CATEGORY_INDEX for ch in code)]
+    for code in valid:
+        for position, ch in enumerate(code):
+            weights[CATEGORY_INDEX[ch]] += CODE_POSITION_WEIGHTS[position]
+    return tuple(weight / (len(valid) or 1) for weight in weights)
+
+
+def alignment(counts, weights: Tuple[float, ...]) -> float:
+    """How well an industry's code weights match a user's category counts"""
+    return sum(count * weight for count, weight in zip(counts, weights))
+
+
+def parse_jupas_info(jupas_str: str) -> Optional[Dict[str, str]]:
+    """Parse a 'subject // code // school // score' Jupas cell"""
+    if not jupas_str:
+        return None
+
+    parts = _split(jupas_str)
+    if len(parts) < 4:  # We expect 4 parts: subject, code, school, score
+        return None
+
+    return {
+        "subject": parts[0],
+        "jupasCode": parts[1],
+        "school": parts[2],
+        "averageScore": f"{parts[3]}/7.0"
+    }
+
+
+class Programme:
+    """A JUPAS programme named in the Industry Insight sheet"""
+    __slots__ = ('code', 'subject', 'school', 'average_score', 'industries')
+
+    def __init__(self, info: Dict[str, str], industries: Tuple[str, ...]):
+        self.code = info["jupasCode"]
+        self.subject = info["subject"]
+        self.school = sys.intern(info["school"])
+        try:
+            self.average_score: Optional[float] = float(info["averageScore"].split("/")[0])
+        except ValueError:
+            self.average_score = None
+        # Industries whose rows list the programme, in sheet order
+        self.industries = industries
+
+
+class QuestionRecord:
+    __slots__ = ('id', 'question_text', 'category', 'category_index')
+
+    def __init__(self, id: int, question_text: str, category: str):
+        self.id = id
+        self.question_text = question_text
+        self.category = sys.intern(str(category))
+        self.category_index = CATEGORY_INDEX.get(category, -1)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'question_text': self.question_text,
+            'category': self.category,
+            'options': ["Yes", "No"]
+        }
+
+
+class TwoDigitProfile:
+    __slots__ = (
+        'code', 'role', 'icon_id', 'who_you_are', 'how_this_combination',
+        'what_you_might_enjoy', 'your_strength'
+    )
+
+    def __init__(self, row: Dict[str, Any]):
+        self.code = sys.intern(str(row.get('Two digit code', '')).strip())
+        self.role = row.get('Role') or ''
+        self.icon_id = '' if row.get('icon_id') is None else str(row['icon_id'])
+        self.who_you_are = row.get('Who you are?') or ''
+        # The sheet header carries a trailing space; accept both spellings
+        self.how_this_combination = _first(
+            row, ['How This Combination Interpret ', 'How This Combination Interpret']
+        )
+        self.what_you_might_enjoy = _split(row.get('What You Might Enjoy'))
+        self.your_strength = _split(row.get('Your strength'))
+
+    def to_dict(self) -> Dict:
+        return {
+            "code": self.code,
+            "role": self.role,
+            "icon_id": self.icon_id,
+            "who_you_are": self.who_you_are,
+            "how_this_combination": self.how_this_combination,
+            "what_you_might_enjoy": list(self.what_you_might_enjoy),
+            "your_strength": list(self.your_strength)
+        }
+
+
+class IndustryRecord:
+    __slots__ = (
+        'industry', 'description', 'trending', 'insight', 'skills_required',
+        'career_path', 'education', 'jupas_info', 'mapping_codes', 'code_weights'
+    )
+
+    def __init__(self, row: Dict[str, Any]):
+        self.industry = _first(row, INDUSTRY_COLUMNS['industry'])
+        self.description = _first(row, INDUSTRY_COLUMNS['overview'])
+        self.trending = _first(row, INDUSTRY_COLUMNS['trending'])
+        self.insight = _first(row, INDUSTRY_COLUMNS['insight'])
+        self.skills_required = _first(row, INDUSTRY_COLUMNS['skills'])
+        self.career_path = _split(_first(row, INDUSTRY_COLUMNS['role']))
+        self.education = _first(row, INDUSTRY_COLUMNS['jupas'])
+        self.jupas_info = parse_jupas_info(str(self.education))
+        self.mapping_codes = frozenset(
+            sys.intern(code) for code in _split(_first(row, INDUSTRY_COLUMNS['mapping']), sep=',')
+        )
+        self.code_weights = code_weights(self.mapping_codes)
+
+    def to_insight(self, matching_code: str) -> Dict:
+        """Build the insight dict returned by SurveyDatabase for a matched code"""
+        insight = {
+            "industry": self.industry,
+            "description": self.description,
+            "trending": self.trending,
+            "insight": self.insight,
+            "skills_required": self.skills_required,
+            "career_path": list(self.career_path),
+            "education": self.education,
+            "jupas_info": dict(self.jupas_info) if self.jupas_info else None,
+            "matching_code": matching_code  # Add the matching code for reference
+        }
+        # Remove any empty values
+        return {k: v for k, v in insight.items() if v}
+
+
+class Catalog:
+    """Immutable, pre-parsed contents of Database.xlsx.
+
+    Built once when the database is loaded so that request handling only
+    performs tuple indexing and dictionary lookups.
+    """
+    __slots__ = (
+        'questions', 'question_positions', 'category_index', 'two_digit', 'industries',
+        'industry_weights', 'industry_positions', 'insights_by_code', 'programmes'
+    )
+
+    def __init__(
+        self,
+        questions: Tuple[QuestionRecord, ...],
+        two_digit: Dict[str, TwoDigitProfile],
+        industries: Tuple[IndustryRecord, ...]
+    ):
+        self.questions = questions
+        # Question id -> position in `questions` (ids follow sheet rows and may skip)
+        self.question_positions = {q.id: pos for pos, q in enumerate(questions)}
+        # Category of each question as an index into CATEGORIES (-1 if unknown)
+        self.category_index = array('b', (q.category_index for q in questions))
+        self.two_digit = two_digit
+        self.industries = industries
+        # Ranking weights by industry name (the first row wins, as in the index)
+        self.industry_weights = {}
+        # Sheet position by industry name, the tie-break wherever industries are ranked
+        self.industry_positions = {}
+        for position, industry in enumerate(industries):
+            self.industry_weights.setdefault(industry.industry, industry.code_weights)
+            self.industry_positions.setdefault(industry.industry, position)
+        self.insights_by_code = _build_insight_index(industries)
+        # Programmes parsed once from the Jupas cells; ProgrammeTable indexes them
+        self.programmes = _build_programmes(industries)
+
+    def industry_insights(self, three_digit_codes: List[str]) -> List[Dict]:
+        """Insights matching any of the codes, de-duplicated by industry name.
+
+        The returned dicts are shared with the index and must not be mutated.
+        """
+        seen = set()
+        insights = []
+        for code in three_digit_codes:
+            for insight in self.insights_by_code.get(code, ()):
+                name = insight.get("industry")
+                if name not in seen:
+                    seen.add(name)
+                    insights.append(insight)
+        return insights
+
+    def rank_insights(self, insights: List[Dict], counts) -> List[Dict]:
+        """Order insights by alignment with the counts; ties go by sheet order"""
+        no_weights = (0.0,) * len(CATEGORIES)
+        unknown = len(self.industries)
+        return sorted(
+            insights,
+            key=lambda insight: (
+                -alignment(counts, self.industry_weights.get(insight.get("industry"), no_weights)),
+                self.industry_positions.get(insight.get("industry"), unknown)
+            )
+        )
+
+
+def _build_insight_index(
+    industries: Tuple[IndustryRecord, ...]
+) -> Dict[str, Tuple[Dict, ...]]:
+    """Map each three-letter code to its insights, one per named industry"""
+    index = {}
+    for code in THREE_DIGIT_CODES:
+        seen = set()
+        insights = []
+        for industry in industries:
+            if not industry.industry or industry.industry in seen:
+                continue
+            if code in industry.mapping_codes:
+                seen.add(industry.industry)
+                insights.append(industry.to_insight(code))
+        index[code] = tuple(insights)
+    return index
+
+
+def _build_programmes(industries: Tuple[IndustryRecord, ...]) -> Tuple[Programme, ...]:
+    """One programme per JUPAS code, with every industry that lists it"""
+    infos: Dict[str, Dict[str, str]] = {}
+    names: Dict[str, List[str]] = {}
+    for industry in industries:
+        info = industry.jupas_info
+        if not info or not info["jupasCode"]:
+            continue
+        code = info["jupasCode"].upper()
+        infos.setdefault(code, info)
+        if industry.industry and industry.industry not in names.setdefault(code, []):
+            names[code].append(industry.industry)
+    return tuple(Programme(info, tuple(names[code])) for code, info in infos.items())
+
+
+def _build_questions(rows: List[Dict[str, Any]]) -> Tuple[QuestionRecord, ...]:
+    questions = []
+    for index, row in enumerate(rows):
+        raw_question = row.get('questions:')
+        category = row.get('category')
+        if raw_question is None or category is None:
+            continue
+
+        raw_question = str(raw_question)
+        if "- question:" in raw_question:
+            question_text = raw_question.split("- question:")[1].strip().strip('"')
+        else:
+            question_text = raw_question.strip().strip('"')
+
+        questions.append(QuestionRecord(index + 1, question_text, category))
+    return tuple(questions)
+
+
+def _build_two_digit(rows: List[Dict[str, Any]]) -> Dict[str, TwoDigitProfile]:
+    profiles = {}
+    for row in rows:
+        profile = TwoDigitProfile(row)
+        # Keep the first row for each code, matching the sheet's precedence
+        if profile.code and profile.code not in profiles:
+            profiles[profile.code] = profile
+    return profiles
+
+
+def build_catalog(
+    question_rows: List[Dict[str, Any]],
+    two_digit_rows: List[Dict[str, Any]],
+    industry_rows: List[Dict[str, Any]]
+) -> Catalog:
+    """Compile sheet rows (dicts with empty cells as None) into a Catalog"""
+    return Catalog(
+        questions=_build_questions(question_rows),
+        two_digit=_build_two_digit(two_digit_rows),
+        industries=tuple(IndustryRecord(row) for row in industry_rows)
+    )
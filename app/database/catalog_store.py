@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.assets import CachedBody
+from app.manifest import AssetManifest
+from app.database.excel_db import SurveyDatabase
+from app.database.programmes import ProgrammeTable
+from app.database.result_cache import ResultCache, dumps
+from app.database.search import SearchIndex
+from app.database.snapshot import file_hash
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogVersion:
+    """Everything derived from one load of Database.xlsx, swapped as a unit.
+
+    Request handlers read `store.current` once and use that version for the
+    whole request, so a reload never mixes data from two workbooks.
+    """
+
+    def __init__(self, db: SurveyDatabase, version: int, assets: AssetManifest):
+        self.db = db
+        self.version = version
+        self.loaded_at = time.time()
+        # Icon URLs are embedded in responses, fingerprinted by the asset manifest
+        self.programmes = ProgrammeTable(db.catalog, assets)
+        self.result_cache = ResultCache(db, programmes=self.programmes, assets=assets)
+        # Identical for every session, so serialize and compress it once
+        self.questions = CachedBody(dumps(db.get_all_questions()), "application/json")
+        self.search = SearchIndex(db.catalog)
+
+
+class CatalogNotReady(Exception):
+    """Raised on access to the catalog before its first load has finished"""
+
+
+class CatalogStore:
+    """Holds the current catalog version and rebuilds it without downtime.
+
+    Nothing is loaded on construction; load() builds the first version,
+    typically from the app's lifespan so the server can accept connections
+    (and answer health checks) in the meantime.
+    """
+
+    def __init__(self, excel_path: str, precompute: bool = False, assets: Optional[AssetManifest] = None):
+        self.excel_path = excel_path
+        self.assets = assets if assets is not None else AssetManifest.load()
+        self.precompute = precompute
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self.last_error: Optional[str] = None
+        self._current: Optional[CatalogVersion] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._current is not None
+
+    @property
+    def current(self) -> CatalogVersion:
+        catalog = self._current
+        if catalog is None:
+            raise CatalogNotReady("The catalog is still loading")
+        return catalog
+
+    def load(self) -> CatalogVersion:
+        """Build the first catalog version, unless one is already loaded"""
+        catalog = self._current
+        if catalog is not None:
+            return catalog
+        with self._reload_lock:
+            if self._current is None:
+                started = time.perf_counter()
+                try:
+                    self._current = self._build(version=1)
+                except Exception as e:
+                    self.last_error = str(e)
+                    raise
+                self.last_error = None
+                logger.info("Catalog loaded in %.2fs", time.perf_counter() - started)
+            return self._current
+
+    def _build(self, version: int) -> CatalogVersion:
+        catalog = CatalogVersion(SurveyDatabase(self.excel_path), version, self.assets)
+        if self.precompute:
+            logger.info("Precomputed %d result patterns", catalog.result_cache.precompute())
+        return catalog
+
+    def reload(self) -> CatalogVersion:
+        """Rebuild and validate the catalog, then swap it in.
+
+        Raises if the workbook fails to load or validate; the previous
+        version stays active in that case.
+        """
+        with self._reload_lock:
+            self._reloading = True
+            try:
+                version = self._current.version + 1 if self._current is not None else 1
+                catalog = self._build(version=version)
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            finally:
+                self._reloading = False
+            # A single reference assignment, so readers see old or new, never both
+            self._current = catalog
+            self.last_error = None
+            logger.info(
+                "Catalog reloaded",
+                extra={"fields": {"version": catalog.version, "source_hash": catalog.db.source_hash}}
+            )
+            return catalog
+
+    def reload_in_background(self) -> bool:
+        """Start a reload thread; returns False if one is already running"""
+        if self._reloading or self._reload_lock.locked():
+            return False
+
+        def run():
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Catalog reload failed")
+
+        threading.Thread(target=run, name="catalog-reload", daemon=True).start()
+        return True
+
+    def watch(self, interval: float, on_change: Optional[Callable[[], None]] = None):
+        """Poll the workbook and reload when its contents change.
+
+        on_change, if given, is called instead of reload(), e.g. to have
+        the gunicorn master reload every worker.
+        """
+        def run():
+            last_mtime = self._mtime()
+            while True:
+                time.sleep(interval)
+                mtime = self._mtime()
+                if mtime is None or mtime == last_mtime:
+                    continue
+                # Wait until the file stops changing so half-written saves are skipped
+                time.sleep(interval)
+                if self._mtime() != mtime:
+                    continue
+                last_mtime = mtime
+                try:
+                    # Editors touch the file on save even without changes
+                    current = self._current
+                    if current is None or file_hash(self.excel_path) != current.db.source_hash:
+                        (on_change or self.reload)()
+                except Exception:
+                    logger.exception("Catalog reload failed")
+
+        threading.Thread(target=run, name="catalog-watch", daemon=True).start()
+
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.excel_path).st_mtime
+        except OSError:
+            return None
+
+    def status(self) -> Dict:
+        catalog = self._current
+        return {
+            "ready": catalog is not None,
+            "version": catalog.version if catalog else None,
+            "source_hash": catalog.db.source_hash if catalog else None,
+            "loaded_at": catalog.loaded_at if catalog else None,
+            "reloading": self._reloading,
+            "last_error": self.last_error
+        }
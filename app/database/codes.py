@@ -0,0 +1,103 @@
+"""Resolution of score vectors to Holland codes.
+
+The codes only depend on a score vector's tie pattern: which categories
+share the highest, the second and the third highest score. There are only
+a few thousand such patterns, so their code sets are expanded once, at
+import, into RESOLUTIONS. Resolving a score vector is then a ranking of
+six numbers and a dictionary lookup, and the expansion never exceeds the
+120 three-letter codes of a full tie.
+"""
+from itertools import permutations, product
+from typing import Dict, List, Sequence, Tuple
+
+from app.database.catalog import CATEGORIES
+
+# Rank shared by every category below the third highest score
+BELOW_THIRD = 3
+
+
+class Resolution:
+    """Ranked tie groups of a tie pattern and the codes they expand to"""
+    __slots__ = ('tiers', 'three_digit_codes', 'two_digit_codes')
+
+    def __init__(self, tiers: Tuple[Tuple[str, ...], ...]):
+        # Highest, second and third highest score groups; lower ones may be empty
+        self.tiers = tiers
+        self.three_digit_codes = tuple(expand_three_digit_codes(*tiers))
+        self.two_digit_codes = tuple(expand_two_digit_codes(tiers[0], tiers[1]))
+
+    @property
+    def primary_code(self) -> str:
+        return self.tiers[0][0] if self.tiers[0] else 'X'
+
+
+def rank_signature(counts: Sequence[int]) -> Tuple[int, ...]:
+    """Rank of each category's score among the distinct scores (0 = highest)"""
+    distinct = sorted(set(counts), reverse=True)
+    rank = {score: min(idx, BELOW_THIRD) for idx, score in enumerate(distinct)}
+    return tuple(rank[count] for count in counts)
+
+
+def resolve(counts: Sequence[int]) -> Resolution:
+    return RESOLUTIONS[rank_signature(counts)]
+
+
+def expand_three_digit_codes(
+    max_cats: Sequence[str], second_cats: Sequence[str], third_cats: Sequence[str]
+) -> List[str]:
+    """Three-digit Holland codes for the given top score groups"""
+    max_cats, second_cats = list(max_cats), list(second_cats)
+    codes = []
+
+    if len(max_cats) >= 3:
+        # If we have 3 or more categories with the same (highest) score
+        for combo in permutations(max_cats, 3):
+            codes.append(''.join(combo))
+    else:
+        # Fill remaining slots with second and third highest categories
+        remaining_slots = 3 - len(max_cats)
+        if len(second_cats) >= remaining_slots:
+            for second_combo in permutations(second_cats, remaining_slots):
+                codes.append(''.join(max_cats + list(second_combo)))
+        else:
+            # Need to use some third highest categories
+            needed_from_third = remaining_slots - len(second_cats)
+            if third_cats:
+                for third_combo in permutations(third_cats, needed_from_third):
+                    codes.append(''.join(max_cats + second_cats + list(third_combo)))
+
+    return sorted(set(codes)) if codes else ['XXX']  # Return unique codes or placeholder
+
+
+def expand_two_digit_codes(max_cats: Sequence[str], second_cats: Sequence[str]) -> List[str]:
+    """Two-digit Holland codes for the given top score groups"""
+    codes = []
+
+    if len(max_cats) >= 2:
+        # If we have 2 or more categories with the same (highest) score
+        for combo in permutations(max_cats, 2):
+            codes.append(''.join(combo))
+    elif len(max_cats) == 1 and second_cats:
+        # One highest category, use second highest for second digit
+        for second_cat in second_cats:
+            codes.append(f"{max_cats[0]}{second_cat}")
+
+    return sorted(set(codes)) if codes else ['XX']  # Return unique codes or placeholder
+
+
+def _build_resolutions() -> Dict[Tuple[int, ...], Resolution]:
+    resolutions = {}
+    for signature in product(range(BELOW_THIRD + 1), repeat=len(CATEGORIES)):
+        # Ranks are dense: there is no second score group without a first, etc.
+        if set(signature) != set(range(len(set(signature)))):
+            continue
+        tiers = tuple(
+            tuple(cat for cat, rank in zip(CATEGORIES, signature) if rank == tier)
+            for tier in range(BELOW_THIRD)
+        )
+        resolutions[signature] = Resolution(tiers)
+    return resolutions
+
+
+# Every tie pattern of six scores (2,163 of them), keyed by rank signature
+RESOLUTIONS = _build_resolutions()
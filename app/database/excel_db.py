@@ -1,36 +1,42 @@
-import pandas as pd
+import logging
 from pathlib import Path
-from itertools import permutations
-from typing import List, Dict
-import numpy as np
+from typing import List, Dict, Optional, Tuple
+
+from app.database.catalog import CATEGORIES, INDUSTRY_COLUMNS, build_catalog
+from app.database.codes import resolve
+from app.database.snapshot import file_hash, load_sheets
+from app.telemetry import NULL_TIMER
+
+logger = logging.getLogger(__name__)
+
 
 class SurveyDatabase:
-    def __init__(self, excel_path: str = 'app/database/Database.xlsx'):
+    def __init__(self, excel_path: str = 'app/database/Database.xlsx', snapshot_path: Optional[str] = None):
         self.excel_path = Path(excel_path)
+        self.catalog = None
         if not self.excel_path.exists():
             raise FileNotFoundError(f"Excel file not found at {excel_path}")
         
         try:
-            # Read all required sheets
-            self.df = pd.read_excel(
-                self.excel_path, 
-                sheet_name="Question pool",
-                engine='openpyxl'
-            )
-            self.two_digit_df = pd.read_excel(
-                self.excel_path, 
-                sheet_name="Two digit",
-                engine='openpyxl'
-            )
-            self.industry_df = pd.read_excel(
-                self.excel_path, 
-                sheet_name="Industry Insight",
-                engine='openpyxl'
+            # Read all required sheets, from the compiled snapshot when it is fresh
+            self.source_hash = file_hash(self.excel_path)
+            sheets = load_sheets(
+                self.excel_path,
+                Path(snapshot_path) if snapshot_path else None,
+                self.source_hash
             )
+            question_sheet = sheets["Question pool"]
+            two_digit_sheet = sheets["Two digit"]
+            industry_sheet = sheets["Industry Insight"]
+
+            question_columns = question_sheet["columns"]
+            two_digit_columns = two_digit_sheet["columns"]
+            industry_columns = industry_sheet["columns"]
             
-            # Debug: Print actual columns from both sheets
-            print("Two digit sheet columns:", list(self.two_digit_df.columns))
-            print("Industry sheet columns:", list(self.industry_df.columns))
+            logger.info(
+                "Loaded workbook sheets",
+                extra={"fields": {"two_digit_columns": two_digit_columns, "industry_columns": industry_columns}}
+            )
             
             # Updated required columns with variations
             required_columns = {
@@ -44,7 +50,7 @@ class SurveyDatabase:
                         'How This Combination Interpret', 'How This Combination Interprets',
                         'What You Might Enjoy', 'What you might enjoy',
                         'Your strength', 'Your Strength', 'Your strengths'
-                    ] if col in self.two_digit_df.columns
+                    ] if col in two_digit_columns
                 ],
                 'Industry': [
                     col for col in [
@@ -56,305 +62,102 @@ class SurveyDatabase:
                         'Required Skills', 'Required skills', 'required skills',
                         'Example Role', 'Example role', 'example role',
                         'Jupas', 'JUPAS', 'jupas'
-                    ] if col in self.industry_df.columns
+                    ] if col in industry_columns
                 ]
             }
             
             # Check Industry sheet with detailed error message
-            required_industry_types = {
-                'mapping': ['Three digital', 'Three Digital', 'Mapping Code'],
-                'industry': ['Industry', 'industry'],
-                'overview': ['Overview', 'overview'],
-                'trending': ['Trending', 'trending'],
-                'insight': ['Insight', 'insight'],
-                'skills': ['Required Skills', 'Required Skill', 'required skills'],
-                'role': ['Example Role', 'Example role', 'example role'],
-                'jupas': ['Jupas', 'JUPAS', 'jupas']
-            }
-            
             missing_industry_types = []
-            for col_type, variants in required_industry_types.items():
-                if not any(variant in self.industry_df.columns for variant in variants):
+            for col_type, variants in INDUSTRY_COLUMNS.items():
+                if not any(variant in industry_columns for variant in variants):
                     missing_industry_types.append(col_type)
             
             if missing_industry_types:
-                print(f"Missing Industry column types: {missing_industry_types}")
-                print("Available Industry columns:", list(self.industry_df.columns))
+                logger.error(
+                    "Missing Industry column types",
+                    extra={"fields": {"missing": missing_industry_types, "available": industry_columns}}
+                )
                 raise ValueError(f"Missing required column types in Industry sheet: {missing_industry_types}")
             
             # Check Question pool sheet
-            if not all(col in self.df.columns for col in required_columns['Question pool']):
+            if not all(col in question_columns for col in required_columns['Question pool']):
                 raise ValueError(f"Missing required columns in Question pool sheet")
             
             # Check Two digit sheet
-            if not all(col in self.two_digit_df.columns for col in required_columns['Two digit']):
+            if not all(col in two_digit_columns for col in required_columns['Two digit']):
                 raise ValueError(f"Missing required columns in Two digit sheet")
             
             # Check Industry sheet
-            if not all(col in self.industry_df.columns for col in required_columns['Industry']):
+            if not all(col in industry_columns for col in required_columns['Industry']):
                 raise ValueError(f"Missing required columns in Industry sheet")
+
+            # Compile the sheets once so requests never touch pandas
+            self.catalog = build_catalog(
+                question_sheet["rows"],
+                two_digit_sheet["rows"],
+                industry_sheet["rows"]
+            )
             
         except Exception as e:
-            print(f"Error reading Excel file: {str(e)}")
+            logger.error("Error reading Excel file: %s", e)
             raise
 
     def get_all_questions(self):
         """Get all questions from the database"""
-        if self.df is None:
-            print("Database not properly initialized")
-            return []
-        
-        questions = []
-        try:
-            for index, row in self.df.iterrows():
-                if pd.isna(row['questions:']) or pd.isna(row['category']):
-                    continue
-                
-                raw_question = str(row['questions:'])
-                if "- question:" in raw_question:
-                    question_text = raw_question.split("- question:")[1].strip().strip('"')
-                else:
-                    question_text = raw_question.strip().strip('"')
-                
-                question = {
-                    'id': index + 1,
-                    'question_text': question_text,
-                    'category': row['category'],
-                    'options': ["Yes", "No"]
-                }
-                questions.append(question)
-        except Exception as e:
-            print(f"Error processing questions: {str(e)}")
+        if self.catalog is None:
+            logger.error("Database not properly initialized")
             return []
-        
-        return questions
+
+        return [question.to_dict() for question in self.catalog.questions]
 
     def _get_two_digit_mapping(self, two_digit_code: str) -> Dict:
         """Get description for two-digit code"""
-        if self.two_digit_df is None:
-            print("Two digit DataFrame is None")
-            return {}
-        
-        try:
-            # Debug print
-            print(f"Looking for two digit code: {two_digit_code}")
-            print("Available codes:", self.two_digit_df['Two digit code'].unique().tolist())
-            
-            # Find the row where the "Two digit code" column matches
-            matching_row = self.two_digit_df[self.two_digit_df['Two digit code'] == two_digit_code]
-            
-            if matching_row.empty:
-                print(f"No matching row found for code: {two_digit_code}")
-                return {}
-            
-            row = matching_row.iloc[0]
-            
-            # Convert row to dict and ensure all numeric values are Python integers
-            row_dict = {k: int(v) if isinstance(v, np.integer) else v for k, v in row.to_dict().items()}
-            print(f"Found matching row: {row_dict}")
-            
-            # Handle the 'How This Combination Interpret' column with space at the end
-            how_this_combination = row_dict.get('How This Combination Interpret ', '')  # Note the space at the end
-            if not how_this_combination:  # Try without space if first attempt is empty
-                how_this_combination = row_dict.get('How This Combination Interpret', '')
-            
-            # Split the fields that contain "//" into lists
-            what_you_might_enjoy = [
-                item.strip() 
-                for item in str(row_dict.get('What You Might Enjoy', '')).split("//")
-                if item.strip()
-            ]
-            
-            your_strength = [
-                item.strip() 
-                for item in str(row_dict.get('Your strength', '')).split("//")
-                if item.strip()
-            ]
-            
-            result = {
-                "code": two_digit_code,
-                "role": row_dict.get('Role', ''),
-                "icon_id": str(row_dict.get('icon_id', '')),
-                "who_you_are": row_dict.get('Who you are?', ''),
-                "how_this_combination": how_this_combination,
-                "what_you_might_enjoy": what_you_might_enjoy,
-                "your_strength": your_strength
-            }
-            
-            # Debug print
-            print("Returning result:", result)
-            return result
-            
-        except Exception as e:
-            print(f"Error getting two-digit mapping: {e}")
-            import traceback
-            traceback.print_exc()
+        profile = self.catalog.two_digit.get(two_digit_code)
+        if profile is None:
+            logger.debug("No matching row found for code: %s", two_digit_code)
             return {}
 
-    def _get_industry_insights(self, three_digit_codes: List[str]) -> List[Dict]:
-        """Get industry insights for three-digit codes"""
-        if self.industry_df is None:
-            print("Industry DataFrame is None")
-            return []
-        
-        insights = []
-        try:
-            # Debug print
-            print(f"Looking for three digit codes: {three_digit_codes}")
-            mapping_column = None
-            
-            # Find the correct mapping column name
-            possible_columns = ['Three digital', 'Three Digital', 'Mapping Code']
-            for col in possible_columns:
-                if col in self.industry_df.columns:
-                    mapping_column = col
-                    break
-                
-            if not mapping_column:
-                print("Could not find mapping column. Available columns:", self.industry_df.columns)
-                return []
-            
-            print(f"Using mapping column: {mapping_column}")
-            
-            # Check each code against the mapping column
-            for code in three_digit_codes:
-                # Iterate through each row in the DataFrame
-                for _, row in self.industry_df.iterrows():
-                    # Get the mapping codes string and split it into individual codes
-                    mapping_codes_str = str(row[mapping_column])
-                    mapping_codes = [c.strip() for c in mapping_codes_str.split(',')]
-                    
-                    # Check if the current code exists in the mapping codes
-                    if code in mapping_codes:
-                        print(f"Found match for code {code} in row with codes: {mapping_codes}")
-                        
-                        # Convert row to dict and handle NaN values
-                        row_dict = {k: ('' if pd.isna(v) else v) for k, v in row.to_dict().items()}
-                        
-                        # Split fields that contain "//" into lists
-                        career_paths = [
-                            path.strip() 
-                            for path in str(row_dict.get('Example Role', '')).split("//")
-                            if path.strip()
-                        ]
-                        
-                        insight = {
-                            "industry": row_dict.get('Industry', ''),
-                            "description": row_dict.get('Overview', ''),
-                            "trending": row_dict.get('Trending', ''),
-                            "insight": row_dict.get('Insight', ''),
-                            "skills_required": row_dict.get('Required Skills', ''),
-                            "career_path": career_paths,
-                            "education": row_dict.get('Jupas', ''),
-                            "matching_code": code  # Add the matching code for reference
-                        }
-                        
-                        # Remove any empty values
-                        insight = {k: v for k, v in insight.items() if v}
-                        
-                        if any(insight.values()):  # Only append if there's at least one non-empty value
-                            insights.append(insight)
-                            print(f"Added insight for code {code}: {insight}")
-                
-        except Exception as e:
-            print(f"Error getting industry insights: {e}")
-            import traceback
-            traceback.print_exc()
-            
-        return insights
+        return profile.to_dict()
 
-    def process_basic_results(self, answers: List[str]) -> Dict:
-        """Process survey answers and generate Holland codes with mappings"""
-        # Initialize counters for each Holland code category
-        category_counts = {
-            'R': 0, 'I': 0, 'A': 0, 
-            'S': 0, 'E': 0, 'C': 0
-        }
-        
-        # Count answers for each category from the survey
-        questions = self.get_all_questions()
-        for q_idx, answer in enumerate(answers):
-            if q_idx < len(questions) and answer.lower() == 'yes':
-                category = questions[q_idx]['category']
-                if category in category_counts:
-                    category_counts[category] += 1
+    def _get_industry_insights(self, three_digit_codes: List[str]) -> List[Dict]:
+        """Get industry insights for three-digit codes, one per industry"""
+        return self.catalog.industry_insights(three_digit_codes)
 
-        # Convert numpy.int64 to regular Python int
-        category_counts = {k: int(v) for k, v in category_counts.items()}
+    def count_answers(self, answers: List[str]) -> Tuple[int, ...]:
+        """Count "yes" answers per category, in CATEGORIES order"""
+        counts = [0] * len(CATEGORIES)
+        for category_idx, answer in zip(self.catalog.category_index, answers):
+            if category_idx >= 0 and answer.lower() == 'yes':
+                counts[category_idx] += 1
+        return tuple(counts)
 
-        # Find categories with maximum scores
-        max_score = max(category_counts.values())
-        max_cats = [cat for cat, count in category_counts.items() if count == max_score]
-        
-        # Find categories with second highest scores
-        second_score = max(count for count in category_counts.values() if count < max_score)
-        second_cats = [cat for cat, count in category_counts.items() if count == second_score]
-        
-        # Find categories with third highest scores
-        remaining_scores = [count for count in category_counts.values() if count < second_score]
-        third_score = max(remaining_scores) if remaining_scores else 0
-        third_cats = [cat for cat, count in category_counts.items() if count == third_score]
-
-        # Generate three-digit and two-digit codes
-        three_digit_codes = self._generate_code(max_cats, second_cats, third_cats)
-        two_digit_codes = self._generate_two_digit_code(max_cats, second_cats)
+    def results_for_counts(self, counts: Tuple[int, ...], timer=NULL_TIMER) -> Dict:
+        """Generate Holland codes with mappings from per-category counts"""
+        with timer.stage("codes"):
+            # Three-digit and two-digit codes come precomputed per tie pattern
+            resolution = resolve(counts)
+            three_digit_codes = list(resolution.three_digit_codes)
+            two_digit_codes = list(resolution.two_digit_codes)
 
         # Get the mappings for both two-digit and three-digit codes
-        personality_type = self._get_two_digit_mapping(two_digit_codes[0])
-        industry_insights = self._get_industry_insights(three_digit_codes)
+        with timer.stage("two_digit"):
+            personality_type = self._get_two_digit_mapping(two_digit_codes[0])
+        with timer.stage("industries"):
+            industry_insights = self.catalog.rank_insights(
+                self._get_industry_insights(three_digit_codes), counts
+            )
 
-        # Ensure all numeric values are Python integers, not numpy types
         result = {
-            "category_counts": category_counts,  # Already converted above
+            "category_counts": dict(zip(CATEGORIES, counts)),
             "three_digit_codes": three_digit_codes,
             "two_digit_codes": two_digit_codes,
-            "primary_code": max_cats[0] if max_cats else 'X',
+            "primary_code": resolution.primary_code,
             "personality_type": personality_type,
             "recommended_industries": industry_insights
         }
 
-        # Debug print
-        print("Final result:", result)
-        
         return result
 
-    def _generate_code(self, max_cats: List[str], second_cats: List[str], third_cats: List[str]) -> List[str]:
-        """Generate three-digit Holland code combinations"""
-        codes = []
-        
-        if len(max_cats) >= 3:
-            # If we have 3 or more categories with the same (highest) score
-            for combo in permutations(max_cats, 3):
-                codes.append(''.join(combo))
-        else:
-            # Fill remaining slots with second and third highest categories
-            remaining_slots = 3 - len(max_cats)
-            if remaining_slots > 0:
-                if len(second_cats) >= remaining_slots:
-                    for second_combo in permutations(second_cats, remaining_slots):
-                        code = ''.join(max_cats + list(second_combo))
-                        codes.append(code)
-                else:
-                    # Need to use some third highest categories
-                    needed_from_third = remaining_slots - len(second_cats)
-                    if needed_from_third > 0 and third_cats:
-                        for third_combo in permutations(third_cats, needed_from_third):
-                            code = ''.join(max_cats + second_cats + list(third_combo))
-                            codes.append(code)
-
-        return sorted(set(codes)) if codes else ['XXX']  # Return unique codes or placeholder
-
-    def _generate_two_digit_code(self, max_cats: List[str], second_cats: List[str]) -> List[str]:
-        """Generate two-digit Holland code combinations"""
-        codes = []
-        
-        if len(max_cats) >= 2:
-            # If we have 2 or more categories with the same (highest) score
-            for combo in permutations(max_cats, 2):
-                codes.append(''.join(combo))
-        elif len(max_cats) == 1 and second_cats:
-            # One highest category, use second highest for second digit
-            for second_cat in second_cats:
-                codes.append(f"{max_cats[0]}{second_cat}")
-
-        return sorted(set(codes)) if codes else ['XX']  # Return unique codes or placeholder
+    def process_basic_results(self, answers: List[str]) -> Dict:
+        """Process survey answers and generate Holland codes with mappings"""
+        return self.results_for_counts(self.count_answers(answers))
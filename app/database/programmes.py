@@ -0,0 +1,69 @@
+"""JUPAS programmes joined with their school icons.
+
+The programme table is rendered once per catalog version. Each entry
+carries the fingerprinted URL of its school's icon from the asset
+manifest, so clients neither parse the Jupas cell nor probe for an icon
+that may not exist.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from app.database.catalog import Catalog, Programme
+from app.manifest import AssetManifest
+
+
+class ProgrammeTable:
+    """Serializable programme entries with lookups by code, school and industry"""
+
+    def __init__(self, catalog: Catalog, assets: AssetManifest):
+        self.assets = assets
+        self.entries: Tuple[Dict, ...] = tuple(self._entry(programme) for programme in catalog.programmes)
+        self.by_code: Dict[str, Dict] = {}
+        self.by_school: Dict[str, List[Dict]] = {}
+        self.by_industry: Dict[str, List[Dict]] = {}
+        for entry in self.entries:
+            self.by_code[entry["jupasCode"].upper()] = entry
+            self.by_school.setdefault(entry["school"], []).append(entry)
+            for industry in entry["industries"]:
+                self.by_industry.setdefault(industry, []).append(entry)
+
+    def school_icon_url(self, school: str) -> Optional[str]:
+        return self.assets.url("school_icon", f"{school}.png")
+
+    def _entry(self, programme: Programme) -> Dict:
+        return {
+            "jupasCode": programme.code,
+            "subject": programme.subject,
+            "school": programme.school,
+            "averageScore": programme.average_score,
+            "industries": list(programme.industries),
+            "schoolIcon": self.school_icon_url(programme.school)
+        }
+
+    def filter(
+        self,
+        code: Optional[str] = None,
+        school: Optional[str] = None,
+        industry: Optional[str] = None,
+        min_score: Optional[float] = None,
+        max_score: Optional[float] = None
+    ) -> List[Dict]:
+        """Entries matching every given filter, in sheet order"""
+        if code is not None:
+            entry = self.by_code.get(code.strip().upper())
+            entries = [entry] if entry else []
+        elif school is not None:
+            entries = self.by_school.get(school, [])
+        elif industry is not None:
+            entries = self.by_industry.get(industry, [])
+        else:
+            entries = self.entries
+
+        def matches(entry: Dict) -> bool:
+            score = entry["averageScore"]
+            return (
+                (school is None or entry["school"] == school)
+                and (industry is None or industry in entry["industries"])
+                and (min_score is None or (score is not None and score >= min_score))
+                and (max_score is None or (score is not None and score <= max_score))
+            )
+        return [entry for entry in entries if matches(entry)]
@@ -0,0 +1,279 @@
+import hashlib
+import os
+from collections import OrderedDict
+from itertools import product
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+from app.assets import CachedBody, EncodedBody
+from app.database.catalog import CATEGORIES, alignment
+from app.database.codes import rank_signature
+from app.database.excel_db import SurveyDatabase
+from app.database.programmes import ProgrammeTable
+from app.manifest import AssetManifest
+from app.telemetry import NULL_TIMER
+
+# Industries per response unless the client pages through more, and the page size cap
+DEFAULT_INDUSTRY_LIMIT = int(os.getenv("ONTRACK_INDUSTRY_LIMIT", 8))
+MAX_INDUSTRY_LIMIT = 50
+
+# Maximum number of serialized /submit responses kept per catalog
+DEFAULT_CACHE_SIZE = int(os.getenv("ONTRACK_RESULT_CACHE_SIZE", 4096))
+
+
+def dumps(content) -> bytes:
+    """Serialize like ORJSONResponse so cached bodies are byte-identical"""
+    return orjson.dumps(content)
+
+
+def riasec_scores(category_counts: Dict[str, int]) -> Dict[str, float]:
+    """Normalize category counts between 0 and 1"""
+    # All-zero counts (every answer "No") score 0 everywhere
+    max_score = max(category_counts.values(), default=0) or 1
+    return {
+        category: count / max_score
+        for category, count in category_counts.items()
+    }
+
+
+def format_personality(personality_data: Dict, assets: Optional[AssetManifest] = None) -> Dict:
+    """Personality section of the analysis result, without RIASEC scores"""
+    personality = {
+        "type": personality_data.get("role", "Default Type"),
+        "description": personality_data.get("who_you_are", "Default description"),
+        "interpretation": personality_data.get("how_this_combination", "Default interpretation"),
+        "enjoyment": personality_data.get("what_you_might_enjoy", ["No enjoyment data available"]),
+        "your_strength": personality_data.get("your_strength", ["No strength data available"]),
+        "iconId": personality_data.get("icon_id", "1")
+    }
+    if assets is not None:
+        personality["iconUrl"] = assets.url("icon", f"{personality['iconId']}.png")
+    return personality
+
+
+def format_industry(industry: Dict, programmes: Optional[ProgrammeTable] = None) -> Dict:
+    """Industry entry of the analysis result, without its display id"""
+    jupas_info = industry.get("jupas_info")
+    if jupas_info and programmes is not None:
+        # Pre-joined, so the client doesn't have to guess the icon URL
+        jupas_info = {**jupas_info, "schoolIcon": programmes.school_icon_url(jupas_info["school"])}
+    return {
+        "name": industry.get("industry", "Unknown Industry"),
+        "overview": industry.get("description", "No overview available"),
+        "trending": industry.get("trending", "No trending information available"),
+        "insight": industry.get("insight", "No insight available"),
+        "examplePaths": list(industry.get("career_path", [])),
+        "education": industry.get("education", ""),
+        "jupasInfo": jupas_info
+    }
+
+
+class ResultCache:
+    """Serialized /submit responses keyed by the six category counts.
+
+    The response only depends on the count vector, so repeated vectors are
+    served from an LRU of final JSON bytes. Misses are assembled from
+    fragments that are serialized once: one per personality, one per
+    industry, and a resolution per tie pattern of the score vector.
+
+    Each industry fragment is also a standalone document addressed by its
+    content hash; compact results list those references instead of
+    repeating the industry text.
+    """
+
+    def __init__(
+        self,
+        db: SurveyDatabase,
+        maxsize: int = DEFAULT_CACHE_SIZE,
+        programmes: Optional[ProgrammeTable] = None,
+        assets: Optional[AssetManifest] = None
+    ):
+        self.db = db
+        self.programmes = programmes
+        self.assets = assets
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self._responses = OrderedDict()
+        self._patterns = {}
+        self._personalities = {}
+        # Industry name -> (fragment, reference); reference -> document
+        self._industries: Dict[str, Tuple[bytes, str]] = {}
+        self._industry_docs: Dict[str, CachedBody] = {}
+        self._industry_sources: Dict[str, bytes] = {}
+        for record in db.catalog.industries:
+            if record.industry and record.industry not in self._industries:
+                self._industry_fragment(record.industry, record.to_insight(""))
+
+    def _industry_fragment(self, name: str, industry: Dict) -> Tuple[bytes, str]:
+        fragment = dumps(format_industry(industry, self.programmes))
+        ref = hashlib.sha256(fragment).hexdigest()[:16]
+        self._industry_sources[ref] = fragment
+        self._industries[name] = (fragment, ref)
+        return fragment, ref
+
+    def industry_ref(self, name: str) -> Optional[str]:
+        """Reference of an industry's detail document, by industry name"""
+        entry = self._industries.get(name)
+        return entry[1] if entry else None
+
+    def industry_document(self, ref: str) -> Optional[CachedBody]:
+        """The industry detail document behind a reference in a compact result"""
+        document = self._industry_docs.get(ref)
+        if document is None:
+            source = self._industry_sources.get(ref)
+            if source is None:
+                return None
+            # Compressed on first request; the content never changes under its reference
+            document = self._industry_docs.setdefault(ref, CachedBody(source, "application/json"))
+        return document
+
+    def peek(
+        self,
+        counts: Tuple[int, ...],
+        limit: int = DEFAULT_INDUSTRY_LIMIT,
+        offset: int = 0,
+        compact: bool = False
+    ) -> Optional[EncodedBody]:
+        """Return the cached result for a count vector, without computing it"""
+        key = (counts, limit, offset, compact)
+        with self._lock:
+            body = self._responses.get(key)
+            if body is not None:
+                self._responses.move_to_end(key)
+            return body
+
+    def get(
+        self,
+        counts: Tuple[int, ...],
+        timer=NULL_TIMER,
+        limit: int = DEFAULT_INDUSTRY_LIMIT,
+        offset: int = 0,
+        compact: bool = False
+    ) -> EncodedBody:
+        """Return the serialized analysis result for a count vector.
+
+        Industries are ranked by alignment with the counts and paged with
+        limit/offset; "totalIndustries" gives the number of matches. With
+        compact, industries are listed as references to their documents.
+        """
+        body = self.peek(counts, limit, offset, compact)
+        if body is not None:
+            return body
+
+        body = EncodedBody(self._render(counts, timer, limit, offset, compact))
+
+        with self._lock:
+            self._responses[(counts, limit, offset, compact)] = body
+            if len(self._responses) > self.maxsize:
+                self._responses.popitem(last=False)
+        return body
+
+    def render(
+        self,
+        counts: Tuple[int, ...],
+        limit: int = DEFAULT_INDUSTRY_LIMIT,
+        offset: int = 0,
+        compact: bool = False
+    ) -> bytes:
+        """Like get(), but the body is not added to the LRU.
+
+        For bulk scoring, which would otherwise evict the interactive
+        entries; the per-pattern fragments are still shared.
+        """
+        body = self.peek(counts, limit, offset, compact)
+        if body is not None:
+            return body.body
+        return self._render(counts, limit=limit, offset=offset, compact=compact)
+
+    def reachable_counts(self):
+        """Yield every count vector the current question pool can produce"""
+        totals = [0] * len(CATEGORIES)
+        for category_idx in self.db.catalog.category_index:
+            if category_idx >= 0:
+                totals[category_idx] += 1
+        return product(*(range(total + 1) for total in totals))
+
+    def precompute(self) -> int:
+        """Resolve and serialize every reachable tie pattern ahead of time.
+
+        Returns the number of distinct patterns. Final bodies are still
+        assembled per count vector, since storing all of them would take
+        several gigabytes for the current question pool.
+        """
+        for counts in self.reachable_counts():
+            self._resolve(counts)
+        return len(self._patterns)
+
+    def _resolve(self, counts: Tuple[int, ...], timer=NULL_TIMER) -> Tuple[bytes, Tuple, Tuple]:
+        """Serialized personality and (fragment, reference) of each industry
+        for a count vector, with each industry's ranking weights"""
+        with timer.stage("codes"):
+            pattern = rank_signature(counts)
+        fragments = self._patterns.get(pattern)
+        if fragments is not None:
+            return fragments
+
+        result = self.db.results_for_counts(counts, timer)
+        with timer.stage("formatting"):
+            personality_data = result.get("personality_type", {})
+            personality_key = personality_data.get("code")
+            personality = self._personalities.get(personality_key)
+            if personality is None:
+                personality = dumps(format_personality(personality_data, self.assets))
+                self._personalities[personality_key] = personality
+
+            # Kept in sheet order, not in the order they were ranked for this first
+            # vector, so that _render's ranking doesn't depend on cache history
+            positions = self.db.catalog.industry_positions
+            candidates = sorted(
+                result.get("recommended_industries", []),
+                key=lambda industry: positions[industry.get("industry")]
+            )
+            industries = []
+            weights = []
+            for industry in candidates:
+                name = industry.get("industry")
+                entry = self._industries.get(name)
+                if entry is None:
+                    entry = self._industry_fragment(name, industry)
+                industries.append(entry)
+                weights.append(self.db.catalog.industry_weights[name])
+
+        fragments = (personality, tuple(industries), tuple(weights))
+        self._patterns[pattern] = fragments
+        return fragments
+
+    def _render(
+        self,
+        counts: Tuple[int, ...],
+        timer=NULL_TIMER,
+        limit: int = DEFAULT_INDUSTRY_LIMIT,
+        offset: int = 0,
+        compact: bool = False
+    ) -> bytes:
+        personality, industries, weights = self._resolve(counts, timer)
+        with timer.stage("ranking"):
+            # The pattern's candidates are shared by many count vectors, so rank per vector;
+            # candidates are in sheet order, so ties go by sheet order
+            order = sorted(
+                range(len(industries)),
+                key=lambda idx: (-alignment(counts, weights[idx]), idx)
+            )
+            page = order[offset:offset + limit]
+        with timer.stage("formatting"):
+            scores = dumps(riasec_scores(dict(zip(CATEGORIES, counts))))
+            if compact:
+                entries: List[bytes] = [b'"%s"' % industries[idx][1].encode() for idx in page]
+            else:
+                entries = [
+                    b'{"id":"%d",' % (offset + rank + 1) + industries[idx][0][1:]
+                    for rank, idx in enumerate(page)
+                ]
+            return b''.join((
+                b'{"personality":', personality[:-1],
+                b',"riasecScores":', scores,
+                b'},"industries":[', b','.join(entries),
+                b'],"totalIndustries":%d}' % len(industries)
+            ))
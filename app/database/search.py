@@ -0,0 +1,126 @@
+"""Full-text search over the Industry Insight sheet.
+
+The index is built once per catalog version. Chinese text is indexed as
+character unigrams and bigrams (there are no word boundaries to split
+on), English and codes such as "JS6054" as word prefixes, so partial
+input matches while the user is still typing. A query matches the
+documents that contain all of its terms, ranked by the field weight and
+rarity of each term.
+"""
+import math
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Set, Tuple
+
+from app.database.catalog import Catalog, IndustryRecord
+
+# Indexed fields of an industry row and how much a match in each counts
+FIELD_WEIGHTS = (
+    ('industry', 5.0),
+    ('jupas', 4.0),
+    ('role', 2.0),
+    ('skills', 1.0),
+    ('overview', 1.0),
+)
+
+# Longest word prefix indexed; longer query words are cut to it
+MAX_PREFIX = 20
+MAX_QUERY_LENGTH = 100
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[a-z0-9]+")
+
+
+def _normalize(text: str) -> str:
+    # NFKC folds full-width letters and digits (Ｊ Ｓ ６) into ASCII
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def index_terms(text: str) -> Set[str]:
+    """Every term a document containing the text can be found by"""
+    terms = set()
+    for token in _TOKEN_RE.findall(_normalize(text)):
+        if token[0].isascii():
+            terms.update(token[:end] for end in range(1, min(len(token), MAX_PREFIX) + 1))
+        else:
+            terms.update(token)
+            terms.update(token[idx:idx + 2] for idx in range(len(token) - 1))
+    return terms
+
+
+def query_terms(text: str) -> Set[str]:
+    """Terms a document must contain to match the query"""
+    terms = set()
+    for token in _TOKEN_RE.findall(_normalize(text)):
+        if token[0].isascii():
+            terms.add(token[:MAX_PREFIX])
+        elif len(token) == 1:
+            terms.add(token)
+        else:
+            terms.update(token[idx:idx + 2] for idx in range(len(token) - 1))
+    return terms
+
+
+def _field_texts(record) -> Iterable[Tuple[str, str]]:
+    yield 'industry', record.industry
+    yield 'jupas', str(record.education)
+    yield 'role', "\n".join(record.career_path)
+    yield 'skills', str(record.skills_required)
+    yield 'overview', str(record.description)
+
+
+class SearchIndex:
+    """Inverted index from terms to industry rows, with per-row term weights"""
+    __slots__ = ('records', 'postings', 'idf')
+
+    def __init__(self, catalog: Catalog):
+        self.records = tuple(record for record in catalog.industries if record.industry)
+        weights = dict(FIELD_WEIGHTS)
+        # Term -> {row: weight of the best field containing it}, plus matched fields
+        self.postings: Dict[str, Dict[int, Tuple[float, Tuple[str, ...]]]] = {}
+        for doc, record in enumerate(self.records):
+            fields: Dict[str, List[str]] = {}
+            for field, text in _field_texts(record):
+                for term in index_terms(text):
+                    fields.setdefault(term, []).append(field)
+            for term, matched in fields.items():
+                best = max(weights[field] for field in matched)
+                self.postings.setdefault(term, {})[doc] = (best, tuple(matched))
+        # Rare terms say more about a match than ones found in every row
+        self.idf = {
+            term: math.log(1 + len(self.records) / len(docs))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[IndustryRecord, float, Tuple[str, ...]]]:
+        """(record, score, matched fields) of the best matches, best first"""
+        terms = query_terms(query[:MAX_QUERY_LENGTH])
+        if not terms:
+            return []
+        postings = []
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                return []
+            postings.append((term, docs))
+        # Intersect starting from the rarest term
+        postings.sort(key=lambda entry: len(entry[1]))
+        candidates = set(postings[0][1])
+        for _, docs in postings[1:]:
+            candidates.intersection_update(docs)
+            if not candidates:
+                return []
+
+        hits = []
+        for doc in candidates:
+            score = 0.0
+            matched = set()
+            for term, docs in postings:
+                weight, fields = docs[doc]
+                score += weight * self.idf[term]
+                matched.update(fields)
+            fields = tuple(field for field, _ in FIELD_WEIGHTS if field in matched)
+            hits.append((self.records[doc], score, fields, doc))
+        # Ties keep sheet order
+        hits.sort(key=lambda hit: (-hit[1], hit[3]))
+        return [(record, score, fields) for record, score, fields, _ in hits[:limit]]
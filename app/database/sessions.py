@@ -0,0 +1,158 @@
+"""Incremental scoring sessions carried in signed tokens.
+
+A session is the answers given so far, as two bitsets over question
+positions (answered and "Yes"), plus the workbook it was started on, its
+analytics cohort and an expiry time. All of it travels in the session id:
+an HMAC-signed token that every update returns anew. Nothing is kept on
+the server, so any worker can serve any request of a session.
+
+Tokens are signed with ONTRACK_SESSION_SECRET. Without it a random key is
+made at import, which gunicorn's preload_app shares between workers but a
+restart invalidates.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import struct
+import time
+from typing import Optional, Tuple
+
+from app.database.catalog import CATEGORIES
+
+# Idle seconds before a session expires
+DEFAULT_SESSION_TTL = float(os.getenv("ONTRACK_SESSION_TTL", 3600))
+SESSION_SECRET = os.getenv("ONTRACK_SESSION_SECRET", "").encode() or secrets.token_bytes(32)
+
+TOKEN_FORMAT = 1
+# Format, expiry (Unix seconds) and workbook hash prefix, then the two bitsets and the cohort
+_HEADER = struct.Struct(">BI8s")
+MAC_BYTES = 16
+
+
+class StaleSession(Exception):
+    """Raised for a valid session started on another version of the workbook"""
+
+
+class Session:
+    """Answers given so far, as bitsets over question positions, plus running counts"""
+    __slots__ = ('catalog', 'answered', 'yes', 'counts', 'cohort', 'expires_at')
+
+    def __init__(self, catalog, expires_at: float, cohort: Optional[str] = None):
+        # The positions only mean something for the workbook the session started on
+        self.catalog = catalog
+        self.answered = 0
+        self.yes = 0
+        self.counts = bytearray(len(CATEGORIES))
+        self.cohort = cohort
+        self.expires_at = expires_at
+
+    @property
+    def num_questions(self) -> int:
+        return len(self.catalog.db.catalog.questions)
+
+    @property
+    def num_answered(self) -> int:
+        return bin(self.answered).count("1")
+
+    @property
+    def complete(self) -> bool:
+        return self.answered == (1 << self.num_questions) - 1
+
+    def score_vector(self) -> Tuple[int, ...]:
+        return tuple(self.counts)
+
+    def answers(self) -> Tuple[str, ...]:
+        """Yes/No answers in question order, as sent to /submit"""
+        return tuple("Yes" if self.yes >> position & 1 else "No" for position in range(self.num_questions))
+
+    def answer(self, question_id: int, yes: bool) -> bool:
+        """Record (or change) one answer in O(1); False if the question is unknown"""
+        catalog = self.catalog.db.catalog
+        position = catalog.question_positions.get(question_id)
+        if position is None:
+            return False
+
+        bit = 1 << position
+        was_yes = bool(self.yes & bit)
+        self.answered |= bit
+        if yes == was_yes:
+            return True
+
+        self.yes ^= bit
+        category_idx = catalog.category_index[position]
+        if category_idx >= 0:
+            self.counts[category_idx] += 1 if yes else -1
+        return True
+
+
+class SessionStore:
+    """Issues and verifies session tokens, with a sliding TTL.
+
+    A token stays valid until it expires, so an earlier token of a session
+    can still be used; each one describes the answers as they were then.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_SESSION_TTL, secret: bytes = SESSION_SECRET):
+        self.ttl = ttl
+        self._secret = secret
+
+    def create(self, catalog, cohort: Optional[str] = None) -> Session:
+        """A new, empty session; token() gives its id"""
+        return Session(catalog, time.time() + self.ttl, cohort)
+
+    def token(self, session: Session) -> str:
+        """Sign the session's current state, extending its lifetime"""
+        session.expires_at = time.time() + self.ttl
+        size = _bitset_bytes(session.num_questions)
+        payload = b"".join((
+            _HEADER.pack(TOKEN_FORMAT, int(session.expires_at), _workbook_id(session.catalog)),
+            session.answered.to_bytes(size, "big"),
+            session.yes.to_bytes(size, "big"),
+            (session.cohort or "").encode("utf-8")
+        ))
+        return base64.urlsafe_b64encode(payload + self._mac(payload)).rstrip(b"=").decode("ascii")
+
+    def get(self, session_id: str, catalog) -> Optional[Session]:
+        """The session behind a token, or None if it is forged or expired.
+
+        Raises StaleSession if the catalog has been reloaded from a
+        different workbook since the session started.
+        """
+        try:
+            data = base64.urlsafe_b64decode(session_id + "=" * (-len(session_id) % 4))
+        except ValueError:
+            return None
+        payload, mac = data[:-MAC_BYTES], data[-MAC_BYTES:]
+        if len(payload) < _HEADER.size or not hmac.compare_digest(mac, self._mac(payload)):
+            return None
+        token_format, expires_at, workbook = _HEADER.unpack_from(payload)
+        if token_format != TOKEN_FORMAT or expires_at <= time.time():
+            return None
+        if workbook != _workbook_id(catalog):
+            raise StaleSession("The questionnaire has changed since the session started")
+
+        session = Session(catalog, expires_at)
+        size = _bitset_bytes(session.num_questions)
+        body = payload[_HEADER.size:]
+        session.answered = int.from_bytes(body[:size], "big")
+        session.yes = int.from_bytes(body[size:2 * size], "big")
+        session.cohort = body[2 * size:].decode("utf-8") or None
+        category_index = catalog.db.catalog.category_index
+        for position in range(session.num_questions):
+            if session.yes >> position & 1 and category_index[position] >= 0:
+                session.counts[category_index[position]] += 1
+        return session
+
+    def _mac(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+def _bitset_bytes(num_questions: int) -> int:
+    return (num_questions + 7) // 8
+
+
+def _workbook_id(catalog) -> bytes:
+    # Workers number their reloads independently, so the workbook is identified by content
+    return bytes.fromhex(catalog.db.source_hash[:16])
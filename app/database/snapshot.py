@@ -0,0 +1,129 @@
+"""Compact JSON snapshot of the sheets in Database.xlsx.
+
+Parsing the workbook with pandas/openpyxl dominates cold starts, so the
+build step compiles it once:
+
+    python -m app.database.snapshot [app/database/Database.xlsx]
+
+The snapshot records a SHA-256 of the workbook it was built from and is
+only used while that hash still matches; otherwise the workbook is parsed
+again and the snapshot refreshed.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SHEETS = ("Question pool", "Two digit", "Industry Insight")
+
+# A sheet is {"columns": [...], "rows": [{column: value or None}, ...]}
+Sheets = Dict[str, Dict[str, List[Any]]]
+
+
+def default_snapshot_path(excel_path: Path) -> Path:
+    return excel_path.with_suffix(".snapshot.json")
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_workbook(excel_path: Path) -> Sheets:
+    """Parse the required sheets from the workbook into plain rows"""
+    # Imported here so that loading from a snapshot never pulls in pandas
+    import pandas as pd
+
+    # One pass over the workbook for all sheets; openpyxl would re-read it per call
+    # (and holds the GIL, so parsing the sheets on separate threads gains nothing)
+    frames = pd.read_excel(excel_path, sheet_name=list(SHEETS), engine='openpyxl')
+    sheets = {}
+    for sheet_name, df in frames.items():
+        sheets[sheet_name] = {
+            "columns": [str(col) for col in df.columns],
+            "rows": [
+                {k: (None if pd.isna(v) else v) for k, v in record.items()}
+                for record in df.to_dict('records')
+            ]
+        }
+    return sheets
+
+
+def load_snapshot(snapshot_path: Path, source_hash: str) -> Optional[Sheets]:
+    """Return the snapshot's sheets if it was built from the given workbook hash"""
+    try:
+        with open(snapshot_path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("source_hash") != source_hash:
+        return None
+    return snapshot.get("sheets")
+
+
+def write_snapshot(snapshot_path: Path, source_hash: str, sheets: Sheets):
+    """Atomically write a snapshot next to the workbook"""
+    # Workers may refresh the snapshot at the same time, so each writes its own temp file
+    fd, tmp_path = tempfile.mkstemp(dir=snapshot_path.parent, prefix=snapshot_path.name + ".", suffix=".tmp")
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {"format": SNAPSHOT_FORMAT, "source_hash": source_hash, "sheets": sheets},
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+                default=str,
+            )
+        os.replace(tmp_path, snapshot_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_sheets(
+    excel_path: Path,
+    snapshot_path: Optional[Path] = None,
+    source_hash: Optional[str] = None
+) -> Sheets:
+    """Load sheets from a fresh snapshot, falling back to parsing the workbook"""
+    snapshot_path = snapshot_path or default_snapshot_path(excel_path)
+    source_hash = source_hash or file_hash(excel_path)
+
+    sheets = load_snapshot(snapshot_path, source_hash)
+    if sheets is not None:
+        return sheets
+
+    logger.info("Snapshot %s missing or stale, parsing %s", snapshot_path, excel_path)
+    sheets = read_workbook(excel_path)
+    try:
+        write_snapshot(snapshot_path, source_hash, sheets)
+    except OSError as e:
+        logger.warning("Could not refresh snapshot: %s", e)
+    return sheets
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.database.snapshot", description=__doc__.splitlines()[0])
+    parser.add_argument("excel_path", nargs="?", default="app/database/Database.xlsx")
+    parser.add_argument("-o", "--output", help="snapshot path (default: next to the workbook)")
+    args = parser.parse_args(argv)
+
+    excel_path = Path(args.excel_path)
+    snapshot_path = Path(args.output) if args.output else default_snapshot_path(excel_path)
+    write_snapshot(snapshot_path, file_hash(excel_path), read_workbook(excel_path))
+    print(f"Wrote {snapshot_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Bounded offloading of CPU-bound work from the event loop.
+
+Scoring is pure Python (and numpy for batches), so running it inside an
+`async def` handler stalls every other request on the worker. Handlers
+hand such work to a BoundedExecutor instead: a small thread pool with a
+cap on queued jobs. When the cap is reached the job is refused with
+`Saturated` and the handler answers 503 with Retry-After, so overload
+shows up as fast rejections rather than an ever-growing queue.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_SCORING_THREADS = int(os.getenv("ONTRACK_SCORING_THREADS", 4))
+DEFAULT_SCORING_QUEUE = int(os.getenv("ONTRACK_SCORING_QUEUE", 64))
+# Seconds a refused client should wait before retrying
+RETRY_AFTER = int(os.getenv("ONTRACK_RETRY_AFTER", 1))
+
+
+class Saturated(Exception):
+    """Raised when the executor's queue is full"""
+
+
+class BoundedExecutor:
+    """Thread pool that refuses work beyond `max_workers + max_pending` jobs"""
+
+    def __init__(self, max_workers: int, max_pending: int, name: str = "worker"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Run func(*args) on the pool and await its result"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise Saturated()
+            self._in_flight += 1
+
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Fires on completion and on cancellation of a job that never started
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def status(self) -> Dict[str, int]:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+        }
+
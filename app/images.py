@@ -0,0 +1,144 @@
+"""Resized and re-encoded variants of the icon PNGs.
+
+Variants are produced once, either lazily on first request or ahead of
+time with the build step:
+
+    python -m app.images
+
+and stored on disk under a name that includes the source's content hash,
+so editing an icon never serves a stale variant.
+"""
+import argparse
+import importlib.util
+import io
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.assets import AssetCache, CachedBody
+
+logger = logging.getLogger(__name__)
+
+# Pillow is optional (originals are served without it) and only imported
+# once a variant is actually rendered, to keep worker start-up light
+HAVE_PILLOW = importlib.util.find_spec("PIL") is not None
+
+# Requested widths are rounded up to one of these to bound the variant count
+ALLOWED_WIDTHS = (32, 64, 96, 128, 192, 256, 384, 512)
+FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+DEFAULT_VARIANT_DIR = Path(os.getenv(
+    "ONTRACK_VARIANT_DIR",
+    Path(__file__).resolve().parent / ".cache" / "image_variants"
+))
+
+
+def normalize_width(width: Optional[int]) -> Optional[int]:
+    if width is None:
+        return None
+    for allowed in ALLOWED_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return ALLOWED_WIDTHS[-1]
+
+
+def render_variant(source: bytes, width: Optional[int], fmt: str) -> bytes:
+    """Downscale (never upscale) and encode an image"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(source)) as image:
+        image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        if width and image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if fmt == "webp":
+            image.save(out, format="WEBP", quality=85, method=6)
+        else:
+            image.save(out, format="PNG", optimize=True)
+        return out.getvalue()
+
+
+class VariantStore:
+    """Disk-backed, memoized image variants for one AssetCache"""
+
+    def __init__(self, assets: AssetCache, cache_dir: Path):
+        self.assets = assets
+        self.cache_dir = cache_dir
+        self._variants: Dict[Tuple[str, Optional[int], str], CachedBody] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, width: Optional[int] = None, fmt: Optional[str] = None) -> Optional[CachedBody]:
+        """Return the asset, resized and/or re-encoded as requested"""
+        source = self.assets.get(name)
+        if source is None:
+            return None
+
+        width = normalize_width(width)
+        fmt = fmt or "png"
+        if not HAVE_PILLOW or (width is None and fmt == "png"):
+            return source
+
+        key = (name, width, fmt)
+        variant = self._variants.get(key)
+        if variant is not None:
+            return variant
+
+        # One generation at a time; concurrent requests for it wait and reuse
+        with self._lock:
+            variant = self._variants.get(key)
+            if variant is None:
+                variant = CachedBody(self._load_or_render(source, name, width, fmt), FORMATS[fmt])
+                self._variants[key] = variant
+        return variant
+
+    def _load_or_render(self, source: CachedBody, name: str, width: Optional[int], fmt: str) -> bytes:
+        digest = source.etag.strip('"')[:12]
+        path = self.cache_dir / f"{Path(name).stem}.{digest}.w{width or 0}.{fmt}"
+        try:
+            return path.read_bytes()
+        except OSError:
+            pass
+
+        data = render_variant(source.body, width, fmt)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + ".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not store image variant %s: %s", path, e)
+        return data
+
+    def pregenerate(self, widths=ALLOWED_WIDTHS, formats=tuple(FORMATS)) -> int:
+        """Generate every width/format combination; returns the variant count"""
+        count = 0
+        for name in self.assets.names:
+            for fmt in formats:
+                for width in (None,) + tuple(widths):
+                    if self.get(name, width, fmt) is not None:
+                        count += 1
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.images", description="Pregenerate icon variants")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_VARIANT_DIR))
+    args = parser.parse_args()
+
+    if not HAVE_PILLOW:
+        raise SystemExit("Pillow is required to generate image variants")
+
+    for kind in ("icon", "school_icon"):
+        store = VariantStore(AssetCache(STATIC_DIR / kind), Path(args.cache_dir) / kind)
+        print(f"{kind}: {store.pregenerate()} variants")
+
+
+if __name__ == "__main__":
+    main()
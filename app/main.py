@@ -1,41 +1,51 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse, FileResponse
-from pathlib import Path
-from urllib.parse import unquote
-import shutil
+from fastapi.responses import ORJSONResponse, PlainTextResponse, RedirectResponse
+import logging
 import os
+import threading
 from dotenv import load_dotenv
+from app.database.catalog_store import CatalogNotReady
+from app.executor import RETRY_AFTER
+from app.telemetry import TimingMiddleware, configure_logging, process_memory, render_metrics
 
 load_dotenv()
+configure_logging()
 
-app = FastAPI()
-
-# Create necessary directories and copy static files
-BASE_DIR = Path(__file__).resolve().parent
-STATIC_DIR = BASE_DIR / "static"
-ICON_DIR = STATIC_DIR / "icon"
-SCHOOL_ICON_DIR = STATIC_DIR / "school_icon"
-
-# Ensure directories exist
-STATIC_DIR.mkdir(parents=True, exist_ok=True)
-ICON_DIR.mkdir(parents=True, exist_ok=True)
-SCHOOL_ICON_DIR.mkdir(parents=True, exist_ok=True)
-
-# Copy static files from app directory if they don't exist in static
-APP_STATIC = BASE_DIR / "app" / "static"
-if APP_STATIC.exists():
-    for item in APP_STATIC.glob("**/*"):
-        if item.is_file():
-            relative_path = item.relative_to(APP_STATIC)
-            target_path = STATIC_DIR / relative_path
-            target_path.parent.mkdir(parents=True, exist_ok=True)
-            if not target_path.exists():
-                shutil.copy2(item, target_path)
-
-# Mount static files directory
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+logger = logging.getLogger(__name__)
+
+
+def _load_catalog():
+    try:
+        survey.store.load()
+    except Exception:
+        logger.exception("Catalog load failed; retry with /api/survey/admin/reload")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the catalog in the background rather than at import, so the port is
+    # bound and /health answers during a slow boot. Under gunicorn the master
+    # has usually loaded it already (see gunicorn.conf.py).
+    if not survey.store.ready:
+        threading.Thread(target=_load_catalog, name="catalog-load", daemon=True).start()
+    # Under gunicorn the master watches the workbook instead, for all workers
+    if survey.WATCH_INTERVAL > 0 and survey.master_pid is None:
+        survey.store.watch(survey.WATCH_INTERVAL)
+    yield
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+
+@app.exception_handler(CatalogNotReady)
+async def catalog_not_ready(request: Request, exc: CatalogNotReady):
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Service is starting, please retry shortly"},
+        headers={"Retry-After": str(RETRY_AFTER)}
+    )
 
 # CORS middleware
 app.add_middleware(
@@ -50,39 +60,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static file handlers
-@app.get("/api/survey/icon/{icon_id}")
-async def get_icon(icon_id: str):
-    try:
-        icon_path = ICON_DIR / f"{icon_id}.png"
-        print(f"Looking for icon at: {icon_path}")
-        if icon_path.exists():
-            return FileResponse(str(icon_path))
-        default_icon = ICON_DIR / "default.png"
-        if default_icon.exists():
-            print("Using default icon")
-            return FileResponse(str(default_icon))
-        raise HTTPException(status_code=404, detail="Icon not found")
-    except Exception as e:
-        print(f"Error serving icon: {e}")
-        raise HTTPException(status_code=404, detail=str(e))
-
-@app.get("/api/survey/school-icon/{school}")
-async def get_school_icon(school: str):
-    try:
-        school_name = unquote(school)
-        icon_path = SCHOOL_ICON_DIR / f"{school_name}.png"
-        print(f"Looking for school icon at: {icon_path}")
-        if icon_path.exists():
-            return FileResponse(str(icon_path))
-        default_icon = SCHOOL_ICON_DIR / "default.png"
-        if default_icon.exists():
-            print("Using default school icon")
-            return FileResponse(str(default_icon))
-        raise HTTPException(status_code=404, detail="School icon not found")
-    except Exception as e:
-        print(f"Error serving school icon: {e}")
-        raise HTTPException(status_code=404, detail=str(e))
+# Request latency histograms and the Server-Timing total
+app.add_middleware(TimingMiddleware)
 
 # Root route
 @app.get("/")
@@ -99,25 +78,50 @@ async def root():
     }
 
 # Include routers
-from app.routers import survey
+from app.routers import survey, static
 app.include_router(
     survey.router,
     prefix="/api/survey",
     tags=["survey"]
 )
+# Icons under /static, fingerprinted per app/static/manifest.json
+app.include_router(static.router, tags=["static"])
 
-# Health check endpoint
+# Liveness: the process is up and serving, whether or not the catalog has loaded
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
-        "static_dirs": {
-            "static": str(STATIC_DIR.exists()),
-            "icon": str(ICON_DIR.exists()),
-            "school_icon": str(SCHOOL_ICON_DIR.exists())
-        }
+        "ready": survey.store.ready,
+        "catalog": survey.store.status(),
+        "static_assets": {
+            kind: len(survey.asset_manifest.names(kind)) for kind in static.ASSET_STORES
+        },
+        # Per worker: icon bytes read into memory so far
+        "static_cache_bytes": {kind: assets.total_bytes for kind, assets in static.ASSET_STORES.items()},
+        # Per worker; each worker process answers for itself
+        "memory": process_memory(),
+        "submission_log": survey.submission_log.status(),
+        "analytics": survey.analytics.status(),
+        "scoring_pool": survey.scoring_pool.status()
     }
 
+# Readiness: 503 until the catalog has loaded, for load balancer health checks
+@app.get("/ready")
+async def readiness_check():
+    if not survey.store.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Catalog is loading",
+            headers={"Retry-After": str(RETRY_AFTER)}
+        )
+    return {"status": "ready", "catalog_version": survey.store.current.version}
+
+# Prometheus text exposition of request and submit-stage latencies
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
@@ -0,0 +1,131 @@
+"""Content-hashed URLs of the static icons.
+
+Build step, run whenever something under app/static changes:
+
+    python -m app.manifest
+
+writes app/static/manifest.json, which maps each icon to a file name that
+includes its content hash (icon/3.png -> icon/3.<hash>.png). Responses
+embed those URLs, and they are served with year-long immutable caching:
+editing an icon changes its URL instead of waiting for caches to expire.
+
+Without a manifest, plain /static/<kind>/<name> URLs are used and
+revalidated with ETags.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+MANIFEST_PATH = STATIC_DIR / "manifest.json"
+STATIC_URL = "/static/"
+MANIFEST_FORMAT = 1
+
+# Static directories with icons, and the file served when one is missing
+ASSET_KINDS = ("icon", "school_icon")
+DEFAULT_ASSET = "default.png"
+FINGERPRINT_LENGTH = 12
+
+
+def fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def fingerprinted_name(name: str, digest: str) -> str:
+    stem, dot, suffix = name.rpartition(".")
+    return f"{stem}.{digest}.{suffix}" if dot else f"{name}.{digest}"
+
+
+class AssetManifest:
+    """Asset paths ("icon/3.png") and their fingerprinted counterparts"""
+
+    def __init__(self, assets: Dict[str, str]):
+        self.assets = assets
+        # Fingerprinted path -> (original path, fingerprint)
+        self._originals: Dict[str, Tuple[str, str]] = {}
+        for path, hashed in assets.items():
+            if hashed != path:
+                self._originals[hashed] = (path, hashed.rsplit(".", 2)[-2])
+
+    @classmethod
+    def load(cls, path: Path = MANIFEST_PATH, static_dir: Path = STATIC_DIR) -> "AssetManifest":
+        """The built manifest, or unhashed paths of the files present if there is none"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") == MANIFEST_FORMAT:
+                return cls(data["assets"])
+            logger.warning("Ignoring asset manifest %s of another format", path)
+        except FileNotFoundError:
+            logger.info("No asset manifest; run python -m app.manifest for cacheable icon URLs")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not load asset manifest %s: %s", path, e)
+        return cls({asset: asset for asset in scan_assets(static_dir)})
+
+    def names(self, kind: str) -> List[str]:
+        """File names of one kind's assets"""
+        prefix = kind + "/"
+        return [path[len(prefix):] for path in self.assets if path.startswith(prefix)]
+
+    def url(self, kind: str, name: str) -> Optional[str]:
+        """URL of an asset, falling back to the kind's default; None if neither exists"""
+        for candidate in (f"{kind}/{name}", f"{kind}/{DEFAULT_ASSET}"):
+            hashed = self.assets.get(candidate)
+            if hashed is not None:
+                return STATIC_URL + quote(hashed)
+        return None
+
+    def resolve(self, kind: str, filename: str) -> Tuple[str, Optional[str]]:
+        """Original file name behind a requested one, and its expected fingerprint"""
+        original = self._originals.get(f"{kind}/{filename}")
+        if original is None:
+            return filename, None
+        path, digest = original
+        return path[len(kind) + 1:], digest
+
+
+def scan_assets(static_dir: Path = STATIC_DIR) -> List[str]:
+    assets = []
+    for kind in ASSET_KINDS:
+        directory = static_dir / kind
+        if directory.exists():
+            assets.extend(
+                f"{kind}/{path.name}" for path in sorted(directory.glob("*.png")) if path.is_file()
+            )
+    return assets
+
+
+def build_manifest(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    return {
+        asset: fingerprinted_name(asset, fingerprint((static_dir / asset).read_bytes()))
+        for asset in scan_assets(static_dir)
+    }
+
+
+def write_manifest(assets: Dict[str, str], path: Path = MANIFEST_PATH):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"format": MANIFEST_FORMAT, "assets": assets}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.manifest", description="Build the static asset manifest")
+    parser.add_argument("--static-dir", default=str(STATIC_DIR))
+    args = parser.parse_args()
+
+    static_dir = Path(args.static_dir)
+    assets = build_manifest(static_dir)
+    write_manifest(assets, static_dir / MANIFEST_PATH.name)
+    print(f"{len(assets)} assets -> {static_dir / MANIFEST_PATH.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from app.assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, cached_response
+from app.routers.survey import asset_manifest, icon_variants, school_icon_variants
+
+router = APIRouter()
+
+ASSET_STORES = {
+    "icon": icon_variants.assets,
+    "school_icon": school_icon_variants.assets
+}
+
+@router.get("/static/{kind}/{filename}")
+async def get_static_asset(request: Request, kind: str, filename: str) -> Response:
+    """Icons by plain or fingerprinted name (see app/manifest.py)"""
+    assets = ASSET_STORES.get(kind)
+    if assets is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    name, digest = asset_manifest.resolve(kind, filename)
+    asset = assets.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Only content that still matches its fingerprint may be cached for good
+    if digest is not None and asset.etag.strip('"').startswith(digest):
+        return cached_response(request, asset, IMMUTABLE_CACHE_CONTROL)
+    return cached_response(request, asset, REVALIDATE_CACHE_CONTROL)
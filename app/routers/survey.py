@@ -1,179 +1,418 @@
-from fastapi import APIRouter, HTTPException
-from app.database.excel_db import SurveyDatabase
-from app.schemas.models import Question, SurveyResponse
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from app.analytics import ALL_COHORT, MAX_COHORT_LENGTH, Analytics
+from app.assets import (
+    IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, AssetCache, EncodedBody,
+    cached_response, encoded_response
+)
+from app.executor import (
+    DEFAULT_SCORING_QUEUE, DEFAULT_SCORING_THREADS, RETRY_AFTER, BoundedExecutor, Saturated
+)
+from app.images import DEFAULT_VARIANT_DIR, VariantStore
+from app.manifest import STATIC_DIR, AssetManifest
+from app.submission_log import SubmissionLog
+from app.telemetry import NULL_TIMER, StageTimer, record_stages
+from app.database.catalog_store import CatalogStore
+from app.database.sessions import SessionStore, StaleSession
+from app.database.result_cache import DEFAULT_INDUSTRY_LIMIT, MAX_INDUSTRY_LIMIT, dumps
+from app.database.search import MAX_QUERY_LENGTH
+from app.schemas.models import Question, SurveyResponse, BatchSurveyResponse, SessionAnswer
+from functools import partial
+import atexit
+import hmac
 import logging
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
 import os
-from pathlib import Path
-import shutil
+import signal
+from typing import Optional
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-db = SurveyDatabase("app/database/Database.xlsx")
-
-# Initialize icon directories
-def init_icon_directories():
-    # Updated paths without double 'app'
-    static_dir = Path("static")
-    icon_dir = static_dir / "icon"
-    school_icon_dir = static_dir / "school_icon"
-
-    # Create directories if they don't exist
-    static_dir.mkdir(parents=True, exist_ok=True)
-    icon_dir.mkdir(parents=True, exist_ok=True)
-    school_icon_dir.mkdir(parents=True, exist_ok=True)
-
-    # Copy default icons if they don't exist
-    default_icon_path = icon_dir / "default.png"
-    default_school_icon_path = school_icon_dir / "default.png"
-
-    # Updated backup path
-    backup_icon_dir = Path("backup/icons")
-    if backup_icon_dir.exists():
-        for icon_file in backup_icon_dir.glob("*.png"):
-            target_path = icon_dir / icon_file.name
-            if not target_path.exists():
-                shutil.copy2(icon_file, target_path)
-
-# Initialize directories when the module loads
-init_icon_directories()
+
+# Fingerprinted icon URLs (python -m app.manifest); read once, with no other file I/O
+asset_manifest = AssetManifest.load()
+
+# The catalog is swapped atomically on reload; handlers read store.current once
+store = CatalogStore(
+    "app/database/Database.xlsx",
+    # Optionally resolve every reachable score vector before serving traffic
+    precompute=os.getenv("ONTRACK_PRECOMPUTE_RESULTS", "").lower() in ("1", "true", "yes"),
+    assets=asset_manifest
+)
+
+# Poll Database.xlsx for edits every N seconds (0 disables the watcher); started by app.main
+WATCH_INTERVAL = float(os.getenv("ONTRACK_WATCH_INTERVAL", 0))
+
+# Under gunicorn, the master that reloads the catalog for every worker (set in post_fork)
+master_pid: Optional[int] = None
+
+# The question list only changes when Database.xlsx does; clients revalidate with the ETag
+QUESTIONS_CACHE_CONTROL = os.getenv(
+    "ONTRACK_QUESTIONS_CACHE_CONTROL",
+    "public, max-age=3600, stale-while-revalidate=86400"
+)
+
+# Cache misses and batches are scored off the event loop, with a bounded queue
+scoring_pool = BoundedExecutor(DEFAULT_SCORING_THREADS, DEFAULT_SCORING_QUEUE, name="scoring")
+
+# Incremental scoring sessions, carried in signed tokens so any worker can serve them
+sessions = SessionStore()
+
+# Submissions are appended to NDJSON segments behind the response
+submission_log = SubmissionLog()
+atexit.register(submission_log.close)
+
+# Live per-cohort aggregates of the results, snapshotted to disk
+analytics = Analytics()
+# Run last to first: the final snapshot, then folding in exited workers' snapshots
+atexit.register(analytics.compact)
+atexit.register(analytics.snapshot)
+
+# Token required by the admin endpoints; they are disabled when unset
+ADMIN_TOKEN = os.getenv("ONTRACK_ADMIN_TOKEN")
+
+# Icons are small, so serve them from memory (read on first request) with strong ETags
+# Resized/WebP variants are generated on first request and cached on disk
+icon_variants = VariantStore(
+    AssetCache(STATIC_DIR / "icon", asset_manifest.names("icon")), DEFAULT_VARIANT_DIR / "icon"
+)
+school_icon_variants = VariantStore(
+    AssetCache(STATIC_DIR / "school_icon", asset_manifest.names("school_icon")), DEFAULT_VARIANT_DIR / "school_icon"
+)
 
 @router.get("/questions")
-async def get_questions():
+async def get_questions(request: Request):
+    # Precompiled per catalog version; the ETag changes whenever a reload changes the questions
+    return cached_response(request, store.current.questions, QUESTIONS_CACHE_CONTROL)
+
+async def _result_body(
+    catalog,
+    counts,
+    timer=NULL_TIMER,
+    limit: int = DEFAULT_INDUSTRY_LIMIT,
+    offset: int = 0,
+    compact: bool = False
+) -> EncodedBody:
+    # Cache hits are a dict lookup; only misses are worth a thread hop
+    body = catalog.result_cache.peek(counts, limit, offset, compact)
+    if body is None:
+        body = await scoring_pool.run(catalog.result_cache.get, counts, timer, limit, offset, compact)
+    return body
+
+# Industries are ranked best first; clients page through them with limit/offset
+IndustryLimit = Query(DEFAULT_INDUSTRY_LIMIT, ge=1, le=MAX_INDUSTRY_LIMIT, description="Industries per page")
+IndustryOffset = Query(0, ge=0, description="Industries to skip")
+# Compact results list industry references to fetch from /industries/{ref} (cached by the browser)
+CompactResult = Query(False, description="List industries as references to their documents")
+
+@router.post("/submit")
+async def submit_survey(
+    request: Request,
+    response: SurveyResponse,
+    limit: int = IndustryLimit,
+    offset: int = IndustryOffset,
+    compact: bool = CompactResult,
+    cohort: Optional[str] = Query(None, max_length=MAX_COHORT_LENGTH, description="Analytics cohort, e.g. a class code")
+):
+    # Outside the try: before the first load this is a 503 (see app.main), not a 500
+    catalog = store.current
     try:
-        questions = db.get_all_questions()
-        return questions
+        timer = StageTimer()
+        # The result only depends on the per-category counts
+        with timer.stage("scoring"):
+            counts = catalog.db.count_answers(response.answers)
+        body = await _result_body(catalog, counts, timer, limit, offset, compact)
+        await submission_log.record(response.answers, counts, catalog.db.source_hash)
+        analytics.record(catalog, counts, cohort)
+
+        with timer.stage("encoding"):
+            result = encoded_response(request, body)
+        record_stages(timer)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Survey submitted", extra={"fields": {"counts": counts, "stages_ms": timer.as_dict()}})
+        result.headers["Server-Timing"] = timer.server_timing()
+        return result
+
+    except Saturated:
+        raise _busy()
     except Exception as e:
+        logger.exception("Error processing survey")
         raise HTTPException(
             status_code=500,
-            detail=f"Error fetching questions: {str(e)}"
+            detail=f"Error processing survey: {str(e)}"
         )
 
-@router.post("/submit")
-async def submit_survey(response: SurveyResponse):
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry shortly",
+        headers={"Retry-After": str(RETRY_AFTER)}
+    )
+
+# Most answer sheets accepted in one /submit/batch request (413 above)
+MAX_BATCH_SIZE = int(os.getenv("ONTRACK_MAX_BATCH_SIZE", 5000))
+
+def _score_batch(catalog, matrix, limit: int, offset: int, compact: bool) -> bytes:
+    from app.database.batch import score_matrix, unique_counts
+
+    vectors, assignments = unique_counts(score_matrix(matrix, catalog.db.catalog))
+    profiles = [catalog.result_cache.render(counts, limit, offset, compact) for counts in vectors]
+
+    return b''.join((
+        b'{"assignments":', dumps(assignments.tolist()),
+        b',"profiles":[', b','.join(profiles), b']}'
+    ))
+
+def _batch_size(batch: BatchSurveyResponse) -> int:
+    for rows in (batch.answers, batch.bitstrings):
+        if rows is not None:
+            return len(rows)
+    return batch.count or 0
+
+@router.post("/submit/batch")
+async def submit_survey_batch(
+    request: Request,
+    batch: BatchSurveyResponse,
+    limit: int = IndustryLimit,
+    offset: int = IndustryOffset,
+    compact: bool = Query(True, description="List industries as references to their documents")
+):
+    """Score many answer sheets at once.
+
+    Returns one analysis result per distinct score vector in "profiles" and,
+    for each sheet in input order, the index of its profile in "assignments".
+    Industries are listed as references to /industries/{ref} unless
+    compact=false, and at most MAX_BATCH_SIZE sheets are accepted per
+    request.
+    """
+    size = _batch_size(batch)
+    if size > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {size} sheets exceeds the limit of {MAX_BATCH_SIZE}; split it up"
+        )
+
+    # numpy is only needed here, so it is not imported at start-up
+    from app.database.batch import build_matrix
+
+    catalog = store.current
+    try:
+        matrix = await scoring_pool.run(partial(
+            build_matrix,
+            catalog.db.catalog,
+            answers=batch.answers,
+            bitstrings=batch.bitstrings,
+            packed=batch.packed,
+            count=batch.count
+        ))
+    except Saturated:
+        raise _busy()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        # Get the basic results from your database
-        basic_result = db.process_basic_results(response.answers)
-        
-        # Get personality type data
-        personality_data = basic_result.get("personality_type", {})
-        
-        # Calculate RIASEC scores (normalized between 0 and 1)
-        category_counts = basic_result.get("category_counts", {})
-        max_score = max(category_counts.values()) if category_counts.values() else 1
-        riasec_scores = {
-            category: count / max_score
-            for category, count in category_counts.items()
-        }
-
-        # Get unique industries based on industry name
-        seen_industries = set()
-        unique_industries = []
-        for industry in basic_result.get("recommended_industries", []):
-            industry_name = industry.get("industry")
-            if industry_name and industry_name not in seen_industries:
-                seen_industries.add(industry_name)
-                unique_industries.append(industry)
-
-        def parse_jupas_info(jupas_str):
-            try:
-                if not jupas_str:
-                    return None
-                    
-                # Remove extra whitespace and split by '//'
-                parts = [part.strip() for part in jupas_str.split('//') if part.strip()]
-                
-                if len(parts) >= 4:  # We expect 4 parts: subject, code, school, score
-                    jupas_info = {
-                        "subject": parts[0],
-                        "jupasCode": parts[1],
-                        "school": parts[2],
-                        "averageScore": f"{parts[3]}/7.0"
-                    }
-                    return jupas_info
-                else:
-                    return None
-                    
-            except Exception as e:
-                return None
-
-        def parse_career_paths(career_paths):
-            if not career_paths:
-                return []
-            
-            # If it's already a list, return it directly
-            if isinstance(career_paths, list):
-                return [path.strip() for path in career_paths if path.strip()]
-            
-            # If it's a string, split it by '//'
-            if isinstance(career_paths, str):
-                return [path.strip() for path in career_paths.split('//') if path.strip()]
-            
-            return []
-
-        # Format the analysis result
-        analysis_result = {
-            "personality": {
-                "type": personality_data.get("role", "Default Type"),
-                "description": personality_data.get("who_you_are", "Default description"),
-                "interpretation": personality_data.get("how_this_combination", "Default interpretation"),
-                "enjoyment": personality_data.get("what_you_might_enjoy", ["No enjoyment data available"]),
-                "your_strength": personality_data.get("your_strength", ["No strength data available"]),
-                "iconId": personality_data.get("icon_id", "1"),
-                "riasecScores": riasec_scores
-            },
-            "industries": [
-                {
-                    "id": str(idx + 1),
-                    "name": industry.get("industry", "Unknown Industry"),
-                    "overview": industry.get("description", "No overview available"),
-                    "trending": industry.get("trending", "No trending information available"),
-                    "insight": industry.get("insight", "No insight available"),
-                    "examplePaths": parse_career_paths(industry.get("career_path", [])),
-                    "education": industry.get("education", ""),
-                    "jupasInfo": parse_jupas_info(industry.get("education", ""))
-                }
-                for idx, industry in enumerate(unique_industries)
-            ]
-        }
-
-        return analysis_result
+        body = await scoring_pool.run(_score_batch, catalog, matrix, limit, offset, compact)
+        # Batches can be megabytes, so compress them off the event loop too
+        return await scoring_pool.run(encoded_response, request, EncodedBody(body))
 
+    except Saturated:
+        raise _busy()
     except Exception as e:
-        import traceback
-        traceback.print_exc()  # This will print the full stack trace
+        logger.exception("Error processing survey batch")
         raise HTTPException(
             status_code=500,
-            detail=f"Error processing survey: {str(e)}"
+            detail=f"Error processing survey batch: {str(e)}"
         )
 
-@router.get("/icon/{icon_id}")
-async def get_icon(icon_id: str):
+def _session_state(session) -> dict:
+    return {
+        # Signed anew on every update; the next request must use this id
+        "id": sessions.token(session),
+        "answered": session.num_answered,
+        "total": session.num_questions,
+        "complete": session.complete,
+        "expires_in": sessions.ttl
+    }
+
+def _get_session(session_id: str):
     try:
-        # Updated path without double 'app'
-        icon_dir = Path("static/icon")
-        icon_path = icon_dir / f"{icon_id}.png"
-        
-        if not icon_path.exists():
-            icon_path = icon_dir / "default.png"
-            if not icon_path.exists():
-                raise HTTPException(status_code=404, detail="Icon not found")
-        
-        return FileResponse(str(icon_path))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error serving icon: {str(e)}")
+        session = sessions.get(session_id, store.current)
+    except StaleSession as e:
+        raise HTTPException(status_code=409, detail=f"{e}; start a new session")
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+@router.post("/sessions", status_code=201)
+async def create_session(
+    cohort: Optional[str] = Query(None, max_length=MAX_COHORT_LENGTH, description="Analytics cohort, e.g. a class code")
+):
+    """Start answering the survey one question at a time"""
+    session = sessions.create(store.current, cohort)
+    return _session_state(session)
+
+@router.patch("/sessions/{session_id}/answers/{question_id}")
+async def answer_question(session_id: str, question_id: int, body: SessionAnswer):
+    """Record or change one answer; returns the session's new id"""
+    session = _get_session(session_id)
+    answer = body.answer.strip().lower()
+    if answer not in ("yes", "no"):
+        raise HTTPException(status_code=422, detail="Answer must be 'Yes' or 'No'")
+    was_complete = session.complete
+    if not session.answer(question_id, answer == "yes"):
+        raise HTTPException(status_code=404, detail=f"Question {question_id} not found")
+
+    if session.complete:
+        counts = session.score_vector()
+        if not was_complete:
+            # Answers are never unset, so this happens once per session: log it like /submit
+            await submission_log.record(session.answers(), counts, session.catalog.db.source_hash)
+            analytics.record(session.catalog, counts, session.cohort)
+        # Have the result ready by the time the client asks for it
+        try:
+            await _result_body(session.catalog, counts)
+        except Saturated:
+            pass  # Computed, or reported, when the result is requested
+    return _session_state(session)
+
+@router.get("/sessions/{session_id}/result")
+async def get_session_result(
+    request: Request,
+    session_id: str,
+    limit: int = IndustryLimit,
+    offset: int = IndustryOffset,
+    compact: bool = CompactResult
+):
+    """The analysis result of a completed session, same shape as /submit"""
+    session = _get_session(session_id)
+    if not session.complete:
+        remaining = session.num_questions - session.num_answered
+        raise HTTPException(status_code=409, detail=f"{remaining} questions are still unanswered")
 
-@router.get("/school-icon/{school}")
-async def get_school_icon(school: str):
     try:
-        # Updated path without double 'app'
-        school_icon_dir = Path("static/school_icon")
-        icon_path = school_icon_dir / f"{school}.png"
-        
-        if not icon_path.exists():
-            icon_path = school_icon_dir / "default.png"
-            if not icon_path.exists():
-                raise HTTPException(status_code=404, detail="School icon not found")
-        
-        return FileResponse(str(icon_path))
+        body = await _result_body(
+            session.catalog, session.score_vector(), limit=limit, offset=offset, compact=compact
+        )
+        return encoded_response(request, body)
+    except Saturated:
+        raise _busy()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error serving school icon: {str(e)}")
+        logger.exception("Error processing survey session")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing survey: {str(e)}"
+        )
+
+@router.get("/industries/{ref}")
+async def get_industry(request: Request, ref: str):
+    """An industry detail document referenced by a compact result.
+
+    References are content hashes, so a document never changes and can be
+    cached indefinitely; a reload that edits an industry gives it a new one.
+    """
+    document = store.current.result_cache.industry_document(ref)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Industry not found")
+    return cached_response(request, document, IMMUTABLE_CACHE_CONTROL)
+
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    limit: int = Query(10, ge=1, le=MAX_INDUSTRY_LIMIT)
+):
+    """Industries and JUPAS programmes matching the query, best first"""
+    catalog = store.current
+    results = []
+    for record, score, fields in catalog.search.search(q, limit):
+        results.append({
+            "industry": record.industry,
+            "ref": catalog.result_cache.industry_ref(record.industry),
+            "score": round(score, 3),
+            "matched": list(fields),
+            "programme": catalog.programmes.by_code.get(record.jupas_info["jupasCode"].upper())
+            if record.jupas_info else None
+        })
+    return {"query": q, "results": results}
+
+@router.get("/programmes")
+async def get_programmes(
+    code: Optional[str] = Query(None, description="JUPAS code, e.g. JS6054"),
+    school: Optional[str] = None,
+    industry: Optional[str] = None,
+    min_score: Optional[float] = Query(None, ge=0),
+    max_score: Optional[float] = Query(None, ge=0)
+):
+    """JUPAS programmes with their school icon URL, optionally filtered"""
+    programmes = store.current.programmes.filter(code, school, industry, min_score, max_score)
+    return {"programmes": programmes, "total": len(programmes)}
+
+# Plain def: reading the other workers' snapshot files runs in the threadpool
+@router.get("/analytics")
+def get_analytics(cohort: str = Query(ALL_COHORT, max_length=MAX_COHORT_LENGTH)):
+    """Score statistics and code/industry frequencies of a cohort's results"""
+    report = analytics.report(cohort)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Cohort not found")
+    return report
+
+def _check_admin_token(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.post("/admin/reload", status_code=202)
+async def reload_catalog(x_admin_token: Optional[str] = Header(None)):
+    """Rebuild the catalog from Database.xlsx in the background and swap it in"""
+    _check_admin_token(x_admin_token)
+    if master_pid is not None:
+        # Rebuilt in the master, which then replaces every worker (gunicorn.conf.py on_reload)
+        os.kill(master_pid, signal.SIGHUP)
+        return {"status": "reloading", **store.status()}
+    if not store.reload_in_background():
+        raise HTTPException(status_code=409, detail="A reload is already in progress")
+    return {"status": "reloading", **store.status()}
+
+@router.get("/admin/catalog")
+async def catalog_status(x_admin_token: Optional[str] = Header(None)):
+    _check_admin_token(x_admin_token)
+    return store.status()
+
+def _serve_icon(
+    request: Request,
+    variants: VariantStore,
+    name: str,
+    width: Optional[int],
+    fmt: Optional[str],
+    detail: str
+) -> Response:
+    # These URLs aren't versioned, so clients revalidate (a 304 via the ETag);
+    # only fingerprinted /static URLs are cached as immutable
+    asset = variants.get(f"{name}.png", width, fmt)
+    if asset is not None:
+        return cached_response(request, asset, REVALIDATE_CACHE_CONTROL)
+    default_icon = variants.get("default.png", width, fmt)
+    if default_icon is not None:
+        return cached_response(request, default_icon, REVALIDATE_CACHE_CONTROL)
+    raise HTTPException(status_code=404, detail=detail)
+
+# Plain def: a cold variant is rendered (resize + encode, up to seconds) on
+# FastAPI's threadpool, not on the event loop
+@router.get("/icon/{icon_id}")
+def get_icon(
+    request: Request,
+    icon_id: str,
+    w: Optional[int] = Query(None, gt=0, description="Target width in pixels"),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(png|webp)$")
+):
+    return _serve_icon(request, icon_variants, icon_id, w, fmt, "Icon not found")
+
+@router.get("/school-icon/{school}")
+def get_school_icon(
+    request: Request,
+    school: str,
+    w: Optional[int] = Query(None, gt=0, description="Target width in pixels"),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(png|webp)$")
+):
+    return _serve_icon(request, school_icon_variants, unquote(school), w, fmt, "School icon not found")
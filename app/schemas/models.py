@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class Question(BaseModel):
     id: int
@@ -10,6 +10,16 @@ class Question(BaseModel):
 class SurveyResponse(BaseModel):
     answers: List[str]
 
+class BatchSurveyResponse(BaseModel):
+    # Exactly one encoding: Yes/No lists, "1011..." strings or base64 packbits
+    answers: Optional[List[List[str]]] = None
+    bitstrings: Optional[List[str]] = None
+    packed: Optional[str] = None
+    count: Optional[int] = None
+
+class SessionAnswer(BaseModel):
+    answer: str
+
 class PersonalityTrait(BaseModel):
     subject: str
     value: float
@@ -0,0 +1,186 @@
+"""Offline bulk scoring of answer sheets.
+
+Streams sheets from a CSV or NDJSON file and writes one NDJSON result per
+input row, without loading the input into memory:
+
+    python -m app.score answers.ndjson -o results.ndjson --workers 4
+
+NDJSON input lines are objects with an optional "id" and "answers", given
+either as a list of "Yes"/"No" strings or as a string such as "1011..." /
+"YNYY...". CSV input needs a header row; an optional "id" column is passed
+through, and either an "answers" column (same string forms) or the
+remaining columns in question order hold the answers.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import sys
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from app.database.excel_db import SurveyDatabase
+
+DEFAULT_DATABASE = 'app/database/Database.xlsx'
+CHUNK_SIZE = 1000
+
+_db: Optional[SurveyDatabase] = None
+
+
+def _load_database(excel_path: str):
+    """Load the database into this process"""
+    global _db
+    _db = SurveyDatabase(excel_path)
+    _summary.cache_clear()
+
+
+def _ensure_database(excel_path: str):
+    """Pool initializer: reuse the parent's database when workers are forked"""
+    if _db is None:
+        _load_database(excel_path)
+
+
+def _normalize_answers(answers) -> List[str]:
+    """Accept answer lists or compact strings and return Yes/No answers"""
+    if isinstance(answers, str):
+        answers = answers.strip()
+        if answers and all(ch in '01YNyn' for ch in answers):
+            return ['Yes' if ch in '1Yy' else 'No' for ch in answers]
+        answers = answers.replace(';', ',').split(',')
+    return [
+        'Yes' if str(answer).strip().lower() in ('yes', '1', 'y', 'true') else 'No'
+        for answer in answers
+    ]
+
+
+@lru_cache(maxsize=8192)
+def _summary(counts) -> Dict:
+    """Per-row output fields for a count vector, shared by identical vectors"""
+    result = _db.results_for_counts(counts)
+    personality = result.get("personality_type", {})
+    return {
+        "category_counts": result["category_counts"],
+        "two_digit_codes": result["two_digit_codes"],
+        "three_digit_codes": result["three_digit_codes"],
+        "role": personality.get("role", ""),
+        "icon_id": personality.get("icon_id", ""),
+        "industries": [
+            industry.get("industry") for industry in result.get("recommended_industries", [])
+        ]
+    }
+
+
+def score_row(row: Dict) -> Dict:
+    """Score one sheet with SurveyDatabase.process_basic_results semantics"""
+    output = {"id": row.get("id")}
+    if "error" in row:
+        output["error"] = row["error"]
+        return output
+    try:
+        counts = _db.count_answers(_normalize_answers(row.get("answers", [])))
+        output.update(_summary(counts))
+    except Exception as e:
+        output["error"] = str(e)
+    return output
+
+
+def score_rows(rows: List[Dict]) -> List[str]:
+    """Score a chunk of sheets and return their serialized NDJSON lines"""
+    return [json.dumps(score_row(row), ensure_ascii=False) for row in rows]
+
+
+def read_ndjson(stream: Iterable[str]) -> Iterator[Dict]:
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {"id": f"line {line_no}", "error": str(e)}
+        if not isinstance(row, dict):
+            row = {"id": f"line {line_no}", "error": "Expected a JSON object"}
+        yield row
+
+
+def read_csv(stream: Iterable[str]) -> Iterator[Dict]:
+    reader = csv.DictReader(stream)
+    fields = reader.fieldnames or []
+    answer_fields = [f for f in fields if f != 'id']
+    for row in reader:
+        if 'answers' in row:
+            answers = row['answers'] or ''
+        else:
+            answers = [row[f] or '' for f in answer_fields]
+        yield {"id": row.get('id'), "answers": answers}
+
+
+def _chunks(rows: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(rows: Iterator[Dict], out, excel_path: str, workers: int = 1, chunk_size: int = CHUNK_SIZE) -> int:
+    """Score all rows into `out` in input order; returns the number of rows"""
+    total = 0
+    _load_database(excel_path)
+    if workers <= 1:
+        for chunk in _chunks(rows, chunk_size):
+            for line in score_rows(chunk):
+                out.write(line + "\n")
+            total += len(chunk)
+        return total
+
+    # Keep a bounded window of chunks in flight so memory stays flat
+    with Pool(workers, initializer=_ensure_database, initargs=(excel_path,)) as pool:
+        pending = deque()
+        for chunk in _chunks(rows, chunk_size):
+            pending.append(pool.apply_async(score_rows, (chunk,)))
+            total += len(chunk)
+            if len(pending) >= workers * 2:
+                for line in pending.popleft().get():
+                    out.write(line + "\n")
+        while pending:
+            for line in pending.popleft().get():
+                out.write(line + "\n")
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.score", description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV or NDJSON file of answer sheets, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="input format (default: from file extension)")
+    parser.add_argument("--workers", type=int, default=1, help="number of scoring processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per work unit")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="path to Database.xlsx")
+    args = parser.parse_args(argv)
+
+    input_format = args.format or ("csv" if args.input.lower().endswith(".csv") else "ndjson")
+
+    with contextlib.ExitStack() as stack:
+        if args.input == "-":
+            source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+        else:
+            source = stack.enter_context(open(args.input, encoding="utf-8", newline=""))
+        if args.output == "-":
+            out = sys.stdout
+        else:
+            out = stack.enter_context(open(args.output, "w", encoding="utf-8"))
+
+        rows = read_csv(source) if input_format == "csv" else read_ndjson(source)
+        total = run(rows, out, args.database, workers=args.workers, chunk_size=args.chunk_size)
+
+    print(f"Scored {total} rows", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Append-only log of survey submissions.
+
+Submissions are queued in memory and written behind the request by a
+background thread, in batches, to NDJSON segment files:
+
+    <directory>/submissions-<UTC start time>-<pid>.ndjson
+
+A segment is closed once it reaches the size limit and a new one is
+started, so a segment is never written by two processes. Each line is
+
+    {"id": "...", "ts": 1700000000.123, "answers": "1011...",
+     "counts": [R, I, A, S, E, C], "catalog": "<workbook hash prefix>"}
+
+with answers as a "1"/"0" string in question order, which
+`python -m app.score` accepts as input for re-scoring.
+
+When the disk falls behind and the queue fills up, the "drop" policy
+discards new entries and counts them; "block" waits up to a bounded time
+for room (off the event loop) before dropping.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOG_DIR = os.getenv(
+    "ONTRACK_SUBMISSION_LOG_DIR",
+    str(Path(__file__).resolve().parent / "data" / "submissions")
+)
+DEFAULT_QUEUE_SIZE = int(os.getenv("ONTRACK_SUBMISSION_LOG_QUEUE", 10000))
+DEFAULT_POLICY = os.getenv("ONTRACK_SUBMISSION_LOG_POLICY", "drop")
+DEFAULT_BLOCK_TIMEOUT = float(os.getenv("ONTRACK_SUBMISSION_LOG_BLOCK_TIMEOUT", 0.05))
+DEFAULT_SEGMENT_BYTES = int(os.getenv("ONTRACK_SUBMISSION_LOG_SEGMENT_MB", 64)) * 1024 * 1024
+
+# Most entries written per write() call, and the longest an entry waits in memory
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+
+# An entry as queued: (timestamp, answers, counts, catalog hash)
+Entry = Tuple[float, Sequence[str], Tuple[int, ...], str]
+
+
+class SubmissionLog:
+    """Bounded write-behind queue in front of rotating NDJSON segments"""
+
+    def __init__(
+        self,
+        directory: Optional[str] = DEFAULT_LOG_DIR,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: str = DEFAULT_POLICY,
+        block_timeout: float = DEFAULT_BLOCK_TIMEOUT,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES
+    ):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown submission log policy: {policy}")
+        # An empty directory disables the log
+        self.directory = Path(directory) if directory else None
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.segment_bytes = segment_bytes
+        self._queue: "queue.Queue[Optional[Entry]]" = queue.Queue(maxsize=queue_size)
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._segment = None
+        self._segment_path: Optional[Path] = None
+        self._segment_size = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    async def record(self, answers: Sequence[str], counts: Tuple[int, ...], catalog_hash: str):
+        """Queue one submission; never waits on disk"""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        entry = (time.time(), answers, counts, catalog_hash[:12])
+        try:
+            self._queue.put_nowait(entry)
+            return
+        except queue.Full:
+            if self.policy == "drop":
+                self.dropped += 1
+                return
+
+        # "block": wait for room on a worker thread, so the event loop keeps serving
+        put = partial(self._queue.put, entry, True, self.block_timeout)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, put)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so a forked worker starts its own writer
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._segment = None
+            self._thread = threading.Thread(target=self._run, name="submission-log", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                entry = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            batch: List[Entry] = []
+            while entry is not None:
+                batch.append(entry)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            stopping = entry is None
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Entry]):
+        data = "".join(_format_entry(entry) for entry in batch).encode("utf-8")
+        try:
+            if self._segment is None or self._segment_size + len(data) > self.segment_bytes:
+                self._rotate()
+            self._segment.write(data)
+            self._segment.flush()
+            self._segment_size += len(data)
+            self.written += len(batch)
+        except OSError as e:
+            self.failed += len(batch)
+            self._segment = None
+            logger.error("Could not write submission log: %s", e)
+
+    def _rotate(self):
+        if self._segment is not None:
+            self._segment.close()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        started = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        self._segment_path = self.directory / f"submissions-{started}-{os.getpid()}.ndjson"
+        self._segment = open(self._segment_path, "ab")
+        self._segment_size = self._segment.tell()
+
+    def close(self, timeout: float = 5.0):
+        """Write out queued entries and stop the writer"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "policy": self.policy,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "segment": str(self._segment_path) if self._segment_path else None
+        }
+
+
+def _format_entry(entry: Entry) -> str:
+    ts, answers, counts, catalog_hash = entry
+    return json.dumps({
+        "id": secrets.token_hex(8),
+        "ts": round(ts, 3),
+        "answers": "".join("1" if str(answer).lower() == "yes" else "0" for answer in answers),
+        "counts": list(counts),
+        "catalog": catalog_hash
+    }) + "\n"
+
@@ -0,0 +1,215 @@
+"""Structured logging, per-stage timings and latency histograms.
+
+Logging goes through the standard library under the "app" logger as one
+JSON object per line. It is quiet by default (WARNING); set
+ONTRACK_LOG_LEVEL=DEBUG to log every submit with its stage timings.
+
+Stage timings of /submit are returned in a Server-Timing header, and all
+request latencies are exported in Prometheus text format on /metrics.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("app")
+
+# Upper bounds in seconds; submit stages are usually well under a millisecond
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; structured fields go in extra={"fields": {...}}"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: Optional[str] = None):
+    """Attach the JSON handler to the "app" logger (idempotent)"""
+    level = (level or os.getenv("ONTRACK_LOG_LEVEL", "WARNING")).upper()
+    logger.setLevel(level)
+    if not any(isinstance(h.formatter, JsonFormatter) for h in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+    logger.propagate = False
+
+
+class StageTimer:
+    """Collects named stage durations for one request"""
+    __slots__ = ('stages',)
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, summed per name"""
+        totals: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds * 1000
+        return {name: round(ms, 3) for name, ms in totals.items()}
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
+
+
+class _NullTimer:
+    """Stand-in used when a caller does not collect timings"""
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """Fixed-bucket latency histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[idx] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            label_str = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label_str},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_str}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{label_str}}} {cumulative}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "ontrack_request_duration_seconds",
+    "Time from request start to the first response byte.",
+    ("endpoint", "status")
+)
+SUBMIT_STAGE_LATENCY = Histogram(
+    "ontrack_submit_stage_duration_seconds",
+    "Time spent in each stage of /api/survey/submit.",
+    ("stage",)
+)
+
+
+def record_stages(timer: StageTimer):
+    for name, ms in timer.as_dict().items():
+        SUBMIT_STAGE_LATENCY.observe((name,), ms / 1000)
+
+
+def process_memory() -> Dict[str, int]:
+    """Memory of this process in bytes.
+
+    On Linux, "shared_bytes" counts pages still shared with other processes
+    (e.g. inherited from a preloading master) and "pss_bytes" splits those
+    evenly between the sharers, so PSS summed over workers is their real cost.
+    """
+    memory = {"pid": os.getpid()}
+    fields = {"Rss": "rss_bytes", "Pss": "pss_bytes"}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            shared = private = 0
+            for line in f:
+                key, _, value = line.partition(":")
+                if not value.strip().endswith("kB"):
+                    continue
+                size = int(value.split()[0]) * 1024
+                if key in fields:
+                    memory[fields[key]] = size
+                elif key.startswith("Shared_"):
+                    shared += size
+                elif key.startswith("Private_"):
+                    private += size
+            memory["shared_bytes"] = shared
+            memory["private_bytes"] = private
+    except OSError:
+        # No smaps (non-Linux): fall back to the peak resident size
+        import resource
+        import sys
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["max_rss_bytes"] = maxrss if sys.platform == "darwin" else maxrss * 1024
+    return memory
+
+
+def render_metrics() -> str:
+    lines = REQUEST_LATENCY.render() + SUBMIT_STAGE_LATENCY.render()
+    return "\n".join(lines) + "\n"
+
+
+class TimingMiddleware:
+    """ASGI middleware recording request latency and adding a Server-Timing total"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                # Routed requests carry their endpoint; label the rest (static files, 404s) "other"
+                label = getattr(scope.get("endpoint"), "__name__", "other")
+                REQUEST_LATENCY.observe((label, str(message["status"])), elapsed)
+
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", f"total;dur={elapsed * 1000:.3f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,12 @@
+"""Benchmarks for the survey API.
+
+Run from the repository root:
+
+    python -m benchmarks.micro                # scoring/lookup microbenchmarks
+    python -m benchmarks.load --concurrency 32 --duration 10
+
+Both write their results as JSON. With --save the results replace the
+stored baseline in benchmarks/baselines/; otherwise they are compared
+against it and every metric is printed with its relative change, so a
+regression shows up as a diff.
+"""
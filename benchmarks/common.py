@@ -0,0 +1,99 @@
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from app.database.catalog import CATEGORIES
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+
+def environment() -> Dict:
+    """Where a result was measured; numbers from different machines don't compare"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[min(len(sorted_values), int(rank)) - 1]
+
+
+def answers_for_counts(categories: List[str], counts: Sequence[int]) -> List[str]:
+    """An answer sheet giving exactly `counts` "Yes" answers per category"""
+    remaining = dict(zip(CATEGORIES, counts))
+    answers = []
+    for category in categories:
+        if remaining.get(category, 0) > 0:
+            remaining[category] -= 1
+            answers.append("Yes")
+        else:
+            answers.append("No")
+    return answers
+
+
+def load_baseline(name: str) -> Optional[Dict]:
+    try:
+        with open(BASELINE_DIR / f"{name}.json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(name: str, results: Dict):
+    BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(BASELINE_DIR / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+
+def compare(baseline: Dict, results: Dict, lower_is_better: Sequence[str]) -> List[str]:
+    """One line per benchmark metric with its change against the baseline"""
+    lines = []
+    old_cases = baseline.get("cases", {})
+    for case, metrics in results["cases"].items():
+        old = old_cases.get(case)
+        if old is None:
+            lines.append(f"{case}: new")
+            continue
+        for metric, value in metrics.items():
+            before = old.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                if value != before:
+                    lines.append(f"{case} {metric}: {before!r} -> {value!r}")
+                continue
+            change = (value - before) / before * 100 if before else 0.0
+            worse = change > 0 if metric in lower_is_better else change < 0
+            flag = " (worse)" if worse and abs(change) >= 10 else ""
+            lines.append(f"{case} {metric}: {before:g} -> {value:g} ({change:+.1f}%){flag}")
+    for case in old_cases.keys() - results["cases"].keys():
+        lines.append(f"{case}: removed")
+    return lines
+
+
+def report(name: str, results: Dict, save: bool, lower_is_better: Sequence[str]):
+    """Write results to stdout and save or diff them against the baseline"""
+    json.dump(results, sys.stdout, indent=2, ensure_ascii=False, sort_keys=True)
+    sys.stdout.write("\n")
+
+    if save:
+        save_baseline(name, results)
+        print(f"Saved baseline {BASELINE_DIR / (name + '.json')}", file=sys.stderr)
+        return
+
+    baseline = load_baseline(name)
+    if baseline is None:
+        print("No baseline stored; rerun with --save to record one", file=sys.stderr)
+        return
+    if baseline.get("environment") != results.get("environment"):
+        print("Baseline was recorded on a different environment", file=sys.stderr)
+    for line in compare(baseline, results, lower_is_better):
+        print(line, file=sys.stderr)
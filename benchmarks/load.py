@@ -0,0 +1,193 @@
+"""In-process load test of the HTTP API.
+
+    python -m benchmarks.load [--concurrency 16] [--duration 5] [--save]
+
+Requests are sent straight to the ASGI app (no sockets, no HTTP client),
+so the numbers measure the application itself: routing, validation,
+scoring and serialization. Each scenario runs `concurrency` clients in a
+closed loop for `duration` seconds and reports throughput and latency
+percentiles.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from benchmarks.common import answers_for_counts, environment, percentile, report
+from benchmarks.micro import TIE_PATTERNS
+
+# (method, path, body) for one request
+Request = Tuple[str, str, Optional[bytes]]
+
+
+async def asgi_request(app, method: str, path: str, body: Optional[bytes] = None,
+                       headers: Optional[List[Tuple[bytes, bytes]]] = None) -> Tuple[int, bytes]:
+    """Run one HTTP request through an ASGI app and return (status, body)"""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"benchmark")] + (headers or []) + (
+            [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+            if body is not None else []
+        ),
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    pending = [{"type": "http.request", "body": body or b"", "more_body": False}]
+    status = 0
+    chunks = []
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Event().wait()  # The client never disconnects
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run the app's startup and shutdown handlers around a load test"""
+    events = asyncio.Queue()
+    await events.put({"type": "lifespan.startup"})
+    started = asyncio.Event()
+    stopped = asyncio.Event()
+
+    async def send(message):
+        if message["type"].startswith("lifespan.startup"):
+            started.set()
+        elif message["type"].startswith("lifespan.shutdown"):
+            stopped.set()
+
+    task = asyncio.ensure_future(app({"type": "lifespan", "asgi": {"version": "3.0"}}, events.get, send))
+    await started.wait()
+    try:
+        yield
+    finally:
+        await events.put({"type": "lifespan.shutdown"})
+        await stopped.wait()
+        await task
+
+
+async def run_scenario(app, make_request: Callable[[random.Random], Request],
+                       concurrency: int, duration: float) -> Dict:
+    """Closed-loop load: each client sends its next request as soon as one completes"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration
+
+    async def client(seed: int):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            method, path, body = make_request(rng)
+            start = time.perf_counter()
+            status, _ = await asgi_request(app, method, path, body)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(seed) for seed in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def scenarios(router_module) -> Dict[str, Callable[[random.Random], Request]]:
+    """Request generators for each scenario, built from the live catalog and icons"""
+    db = router_module.store.current.db
+    categories = [question.category for question in db.catalog.questions]
+
+    def random_submit(rng: random.Random) -> Request:
+        answers = [rng.choice(("Yes", "No")) for _ in categories]
+        return "POST", "/api/survey/submit", json.dumps({"answers": answers}).encode()
+
+    tie_bodies = [
+        json.dumps({"answers": answers_for_counts(categories, counts)}).encode()
+        for counts in TIE_PATTERNS.values()
+    ]
+
+    def tie_submit(rng: random.Random) -> Request:
+        return "POST", "/api/survey/submit", rng.choice(tie_bodies)
+
+    icons = [name.rsplit(".", 1)[0] for name in router_module.icon_variants.assets.names]
+    schools = [name.rsplit(".", 1)[0] for name in router_module.school_icon_variants.assets.names]
+
+    result = {
+        "questions": lambda rng: ("GET", "/api/survey/questions", None),
+        "submit_random": random_submit,
+        "submit_ties": tie_submit,
+    }
+    if icons:
+        result["icon"] = lambda rng: ("GET", f"/api/survey/icon/{rng.choice(icons)}", None)
+    if schools:
+        result["school_icon"] = lambda rng: (
+            "GET", f"/api/survey/school-icon/{quote(rng.choice(schools))}", None
+        )
+    return result
+
+
+async def run(concurrency: int, duration: float, only: Optional[List[str]]) -> Dict:
+    from app import main
+    from app.routers import survey
+
+    # Loaded up front, so the runs don't wait on (or measure) start-up
+    survey.store.load()
+    cases = {}
+    async with lifespan(main.app):
+        for name, make_request in scenarios(survey).items():
+            if only and name not in only:
+                continue
+            print(f"Running {name} ({concurrency} clients, {duration:g}s)...", file=sys.stderr)
+            cases[name] = await run_scenario(main.app, make_request, concurrency, duration)
+
+    return {
+        "environment": environment(),
+        "settings": {"concurrency": concurrency, "duration": duration},
+        "cases": cases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients (default: 16)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario (default: 5)")
+    parser.add_argument("--scenario", action="append", help="run only this scenario (repeatable)")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.concurrency, args.duration, args.scenario))
+    report("load", results, args.save, lower_is_better=("p50_ms", "p95_ms", "p99_ms"))
+
+
+if __name__ == "__main__":
+    main()
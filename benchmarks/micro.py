@@ -0,0 +1,81 @@
+"""Microbenchmarks of the scoring and lookup paths behind /submit.
+
+    python -m benchmarks.micro [--repeat 5] [--save]
+
+Each case is timed per call, over a range of tie patterns up to all six
+categories tied (the worst case for code resolution: 120 three-digit
+codes to look up).
+"""
+import argparse
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, Tuple
+
+from app.database.codes import resolve
+from app.database.excel_db import SurveyDatabase
+from benchmarks.common import answers_for_counts, environment, report
+
+DEFAULT_DATABASE = "app/database/Database.xlsx"
+
+# Per-category "Yes" counts, in CATEGORIES order (R, I, A, S, E, C)
+TIE_PATTERNS: Dict[str, Tuple[int, ...]] = {
+    "no_ties": (7, 6, 5, 4, 3, 2),
+    "two_tied_top": (7, 7, 5, 4, 3, 2),
+    "three_tied_top": (6, 6, 6, 3, 2, 1),
+    "five_tied_second": (7, 5, 5, 5, 5, 5),
+    "five_tied_top": (5, 5, 5, 5, 5, 2),
+    "all_six_tied": (4, 4, 4, 4, 4, 4),
+}
+
+
+def time_call(func: Callable[[], object], repeat: int) -> Dict:
+    """Per-call timings in microseconds, or the error the call raises"""
+    try:
+        func()
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    runs = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min_us": round(min(runs), 3),
+        "median_us": round(statistics.median(runs), 3),
+    }
+
+
+def run(db: SurveyDatabase, repeat: int) -> Dict:
+    categories = [question.category for question in db.catalog.questions]
+    cases = {"get_all_questions": time_call(db.get_all_questions, repeat)}
+
+    for name, counts in TIE_PATTERNS.items():
+        answers = answers_for_counts(categories, counts)
+        codes = list(resolve(counts).three_digit_codes)
+
+        cases[f"process_basic_results[{name}]"] = time_call(
+            lambda: db.process_basic_results(answers), repeat
+        )
+        cases[f"resolve[{name}]"] = time_call(lambda: resolve(counts), repeat)
+        cases[f"_get_industry_insights[{name}]"] = dict(
+            time_call(lambda: db._get_industry_insights(codes), repeat),
+            codes=len(codes)
+        )
+
+    return {"environment": environment(), "cases": cases}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro", description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (default: 5)")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    db = SurveyDatabase(args.database)
+    print("Running microbenchmarks...", file=sys.stderr)
+    report("micro", run(db, args.repeat), args.save, lower_is_better=("min_us", "median_us"))
+
+
+if __name__ == "__main__":
+    main()
@@ -55,7 +55,9 @@ export function CareerPersonalityAnalysis({ analysis }: Props) {
             <div className="flex flex-col items-center justify-center p-8 h-[400px]">
               <div className="relative w-full h-full">
                 <img
-                  src={`${config.API_BASE_URL}/static/icon/${analysis.iconId}.png`}
+                  src={analysis.iconUrl
+                    ? `${config.API_BASE_URL}${analysis.iconUrl}`
+                    : `${config.API_BASE_URL}/static/icon/${analysis.iconId}.png`}
                   alt="Character Icon"
                   className="w-full h-full object-contain"
                   onError={(e) => {
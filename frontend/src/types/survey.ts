@@ -20,6 +20,7 @@ export interface PersonalityAnalysis {
   enjoyment: string[];
   your_strength: string[];
   iconId: string;
+  iconUrl?: string | null;
   riasecScores: {
     [key: string]: number;
   };
@@ -38,6 +39,7 @@ export interface IndustryRecommendation {
     jupasCode: string;
     school: string;
     averageScore: string;
+    schoolIcon?: string | null;
   };
 }
 
@@ -0,0 +1,85 @@
+"""Multi-worker production configuration.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (preload_app), which loads the
+catalog as soon as the port is bound (when_ready). Workers are forked from
+it, so the catalog and the precomputed result patterns are built once and
+shared copy-on-write between workers instead of being loaded by each of
+them. Before each fork the master's objects are moved out of the garbage
+collector's reach (gc.freeze), so collections in the workers don't write
+to, and thereby unshare, those pages. /health reports each worker's
+shared and private memory; /ready is 503 until the catalog has loaded.
+
+Environment:
+    WEB_CONCURRENCY             worker processes (default: 2)
+    PORT                        listen port (default: 8000)
+    ONTRACK_PRECOMPUTE_RESULTS  resolve every score pattern in the master (default: on)
+    ONTRACK_SCORING_THREADS     scoring threads per worker (default: 4)
+    ONTRACK_SCORING_QUEUE       queued scoring jobs per worker before 503 (default: 64)
+    ONTRACK_WATCH_INTERVAL      seconds between Database.xlsx checks, in the master (default: off)
+
+Catalog reloads go through the master, so every worker, including ones
+recycled later, serves the same workbook: on SIGHUP (`kill -HUP <master
+pid>`, /admin/reload, or the watcher noticing an edit) it rebuilds its
+catalog (on_reload) before forking new workers, which replace the old
+ones gracefully. Scoring sessions
+(/api/survey/sessions) are carried in signed tokens, so any worker serves
+them; set ONTRACK_SESSION_SECRET to keep them valid across restarts.
+"""
+import gc
+import os
+import signal
+
+# Worth doing once here when every worker inherits the result
+os.environ.setdefault("ONTRACK_PRECOMPUTE_RESULTS", "1")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# Recycle workers slowly so a leak can't grow unbounded; jitter avoids restarting them together
+max_requests = 50000
+max_requests_jitter = 5000
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs in the master after the port is bound and before the first fork,
+    # so the catalog is loaded once and shared by every worker
+    from app.routers import survey
+    try:
+        survey.store.load()
+    except Exception:
+        # Each worker tries again in its lifespan; /ready reports 503 meanwhile
+        server.log.exception("Catalog load failed in the master")
+    if survey.WATCH_INTERVAL > 0:
+        # Only signals; the reload itself runs in on_reload, on the master's main thread
+        survey.store.watch(survey.WATCH_INTERVAL, on_change=lambda: os.kill(os.getpid(), signal.SIGHUP))
+
+
+def on_reload(server):
+    # With preload_app, SIGHUP keeps the imported app and forks new workers
+    # from it, so the master's catalog has to be rebuilt here
+    from app.routers import survey
+    # The old catalog was frozen before the last fork; let its cycles be collected
+    gc.unfreeze()
+    try:
+        survey.store.reload()
+    except Exception:
+        # The new workers keep serving the previous catalog
+        server.log.exception("Catalog reload failed in the master")
+
+
+def pre_fork(server, worker):
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Catalog reloads are requested from the master (see on_reload)
+    from app.routers import survey
+    survey.master_pid = server.pid
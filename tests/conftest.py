@@ -0,0 +1,8 @@
+import pytest
+
+from app.database.excel_db import SurveyDatabase
+
+
+@pytest.fixture(scope="session")
+def db():
+    return SurveyDatabase("app/database/Database.xlsx")
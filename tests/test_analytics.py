@@ -0,0 +1,95 @@
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from app.analytics import ALL_COHORT, ROLLUP_NAME, Analytics
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _worker(directory, catalog, pid, vectors, cohort):
+    """Snapshot of a worker that recorded the vectors under the given pid"""
+    analytics = Analytics(str(directory))
+    for counts in vectors:
+        analytics.record(catalog, counts, cohort)
+    analytics.snapshot()
+    path = analytics._snapshot_path
+    path.rename(path.with_name(f"analytics-{pid}-{path.stem.rsplit('-', 1)[1]}.json"))
+
+
+def test_compact_folds_exited_workers_into_rollup(db, tmp_path):
+    catalog = SimpleNamespace(version=1, db=db)
+    vectors = [(3, 1, 4, 1, 5, 9), (2, 7, 1, 8, 2, 8), (0, 0, 0, 0, 0, 0), (6, 6, 6, 1, 1, 1)]
+    for idx in range(len(vectors)):
+        _worker(tmp_path, catalog, _dead_pid(), vectors[:idx + 1], "5A")
+    reader = Analytics(str(tmp_path))
+    before = reader.report(ALL_COHORT)
+    assert before["submissions"] == 10
+
+    reader.compact()
+    assert [path.name for path in tmp_path.glob("analytics-*.json")] == [ROLLUP_NAME]
+    assert reader.report(ALL_COHORT) == before
+    assert reader.report("5A")["submissions"] == 10
+
+    # Later exits are merged into the existing rollup
+    _worker(tmp_path, catalog, _dead_pid(), vectors[:1], "5B")
+    reader.compact()
+    report = reader.report(ALL_COHORT)
+    assert report["submissions"] == 11
+    assert report["cohorts"] == ["5A", "5B"]
+
+
+def test_compact_keeps_running_workers(db, tmp_path):
+    catalog = SimpleNamespace(version=1, db=db)
+    _worker(tmp_path, catalog, 1, [(1, 2, 3, 4, 5, 6)], "5A")
+    Analytics(str(tmp_path)).compact()
+    assert not (tmp_path / ROLLUP_NAME).exists()
+    assert len(list(tmp_path.glob("analytics-1-*.json"))) == 1
+
+
+def test_cohort_cap_includes_all(db):
+    catalog = SimpleNamespace(version=1, db=db)
+    analytics = Analytics(None, max_cohorts=3)
+    for cohort in ("a", "b", "c", "d"):
+        analytics.record(catalog, (1, 2, 3, 4, 5, 6), cohort)
+    report = analytics.report(ALL_COHORT)
+    assert report["cohorts"] == ["a", "b"]
+    assert report["submissions"] == 4
+    assert report["droppedCohortResults"] == 2
+    assert analytics.status()["dropped"] == 2
+
+
+def test_concurrent_reports_during_compaction(db, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    catalog = SimpleNamespace(version=1, db=db)
+    for _ in range(20):
+        _worker(tmp_path, catalog, _dead_pid(), [(1, 2, 3, 4, 5, 6)], "5A")
+    reader = Analytics(str(tmp_path))
+    reader.report(ALL_COHORT)
+
+    with ThreadPoolExecutor(8) as pool:
+        reports = [pool.submit(reader.report, ALL_COHORT) for _ in range(64)]
+        reader.compact()
+        for report in reports:
+            assert report.result()["submissions"] in range(0, 21)
+    assert reader.report(ALL_COHORT)["submissions"] == 20
+
+
+def test_dropped_results_survive_compaction(db, tmp_path):
+    catalog = SimpleNamespace(version=1, db=db)
+    worker = Analytics(str(tmp_path), max_cohorts=2)
+    for cohort in ("a", "b", "c"):
+        worker.record(catalog, (1, 2, 3, 4, 5, 6), cohort)
+    worker.snapshot()
+    path = worker._snapshot_path
+    path.rename(path.with_name(f"analytics-{_dead_pid()}-{path.stem.rsplit('-', 1)[1]}.json"))
+
+    reader = Analytics(str(tmp_path))
+    assert reader.report(ALL_COHORT)["droppedCohortResults"] == 2
+    reader.compact()
+    assert reader.report(ALL_COHORT)["droppedCohortResults"] == 2
@@ -0,0 +1,45 @@
+from app.database.catalog import CATEGORIES
+from app.database.codes import RESOLUTIONS, expand_three_digit_codes, expand_two_digit_codes, resolve
+from app.database.result_cache import ResultCache
+
+
+def _legacy_tiers(counts):
+    """Score tiers as ranked before RESOLUTIONS, by scanning the counts"""
+    category_counts = dict(zip(CATEGORIES, counts))
+    max_score = max(category_counts.values())
+    max_cats = [cat for cat, count in category_counts.items() if count == max_score]
+    # Raises ValueError when every count is equal, as it used to
+    second_score = max(count for count in category_counts.values() if count < max_score)
+    second_cats = [cat for cat, count in category_counts.items() if count == second_score]
+    remaining_scores = [count for count in category_counts.values() if count < second_score]
+    third_score = max(remaining_scores) if remaining_scores else 0
+    third_cats = [cat for cat, count in category_counts.items() if count == third_score]
+    return tuple(max_cats), tuple(second_cats), tuple(third_cats)
+
+
+def test_resolutions_match_legacy_ranking_for_every_reachable_vector(db):
+    expanded = {}
+    checked = ties = 0
+    for counts in ResultCache(db).reachable_counts():
+        resolution = resolve(counts)
+        try:
+            tiers = _legacy_tiers(counts)
+        except ValueError:
+            # Used to be a 500; now a full tie at the top
+            assert resolution.tiers[0] == CATEGORIES
+            ties += 1
+            continue
+        codes = expanded.get(tiers)
+        if codes is None:
+            codes = expanded[tiers] = (
+                tuple(expand_three_digit_codes(*tiers)),
+                tuple(expand_two_digit_codes(tiers[0], tiers[1]))
+            )
+        assert (resolution.three_digit_codes, resolution.two_digit_codes) == codes, counts
+        checked += 1
+    assert checked + ties == 254016
+
+
+def test_resolutions_cover_every_tie_pattern():
+    assert len(RESOLUTIONS) == 2163
+    assert max(len(resolution.three_digit_codes) for resolution in RESOLUTIONS.values()) == 120
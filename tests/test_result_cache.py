@@ -0,0 +1,44 @@
+import json
+import random
+
+from app.database.codes import rank_signature
+from app.database.result_cache import ResultCache
+
+
+def _vectors_sharing_patterns(cache, samples=3000, seed=0):
+    """Pairs of distinct reachable count vectors with the same tie pattern"""
+    by_pattern = {}
+    for counts in cache.reachable_counts():
+        by_pattern.setdefault(rank_signature(counts), []).append(counts)
+    rng = random.Random(seed)
+    groups = [vectors for vectors in by_pattern.values() if len(vectors) > 1]
+    return [tuple(rng.sample(rng.choice(groups), 2)) for _ in range(samples)]
+
+
+def test_render_does_not_depend_on_cache_history(db):
+    pairs = _vectors_sharing_patterns(ResultCache(db))
+    forward, backward = ResultCache(db), ResultCache(db)
+    for first, second in pairs:
+        forward.get(first, limit=50)
+        backward.get(second, limit=50)
+    for first, second in pairs:
+        for counts in (first, second):
+            assert forward.get(counts, limit=50).body == backward.get(counts, limit=50).body
+
+
+def test_all_no_top_page_is_stable(db):
+    warmed_high, warmed_low = ResultCache(db), ResultCache(db)
+    warmed_high.get((6, 6, 6, 6, 6, 6))
+    warmed_low.get((2, 2, 2, 2, 2, 2))
+    zeros = (0, 0, 0, 0, 0, 0)
+    assert warmed_high.get(zeros).body == warmed_low.get(zeros).body == ResultCache(db).get(zeros).body
+
+
+def test_render_matches_results_for_counts(db):
+    cache = ResultCache(db)
+    rng = random.Random(1)
+    vectors = list(cache.reachable_counts())
+    for counts in rng.sample(vectors, 500):
+        expected = [insight["industry"] for insight in db.results_for_counts(counts)["recommended_industries"]]
+        result = json.loads(cache.get(counts, limit=50).body)
+        assert [industry["name"] for industry in result["industries"]] == expected
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.database.sessions import SessionStore, StaleSession
+
+
+@pytest.fixture
+def catalog(db):
+    return SimpleNamespace(db=db)
+
+
+def _answer_all(store, catalog, pattern):
+    session = store.create(catalog, "5A")
+    token = store.token(session)
+    for position, question in enumerate(catalog.db.catalog.questions):
+        session = store.get(token, catalog)
+        assert session.answer(question.id, pattern(position))
+        token = store.token(session)
+    return token
+
+
+def test_any_worker_continues_a_session(db, catalog):
+    # Separate stores with the same key stand in for forked workers
+    workers = [SessionStore(secret=b"k"), SessionStore(secret=b"k")]
+    session = workers[0].create(catalog, "5A")
+    token = workers[0].token(session)
+    answers = []
+    for idx, question in enumerate(db.catalog.questions):
+        session = workers[idx % 2].get(token, catalog)
+        answers.append("Yes" if idx % 3 else "No")
+        assert session.answer(question.id, idx % 3 != 0)
+        token = workers[idx % 2].token(session)
+
+    session = workers[1].get(token, catalog)
+    assert session.complete
+    assert session.cohort == "5A"
+    assert session.score_vector() == db.count_answers(answers)
+    assert session.answers() == tuple(answers)
+
+
+def test_forged_expired_and_stale_tokens(db, catalog):
+    store = SessionStore(secret=b"k")
+    token = _answer_all(store, catalog, lambda position: position % 2 == 0)
+    assert store.get(token, catalog).complete
+
+    assert SessionStore(secret=b"other").get(token, catalog) is None
+    tampered = token[:10] + ("A" if token[10] != "A" else "B") + token[11:]
+    assert store.get(tampered, catalog) is None
+    assert store.get("not a token", catalog) is None
+    expired = SessionStore(ttl=-1, secret=b"k")
+    assert expired.get(expired.token(expired.create(catalog)), catalog) is None
+
+    other_workbook = SimpleNamespace(db=SimpleNamespace(catalog=db.catalog, source_hash="0" * 64))
+    with pytest.raises(StaleSession):
+        store.get(token, other_workbook)
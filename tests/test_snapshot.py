@@ -0,0 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database.snapshot import load_snapshot, write_snapshot
+
+
+def test_concurrent_writers_leave_a_valid_snapshot(tmp_path):
+    path = tmp_path / "Database.snapshot.json"
+    sheets = {"Question pool": {"columns": ["id"], "rows": [{"id": idx} for idx in range(2000)]}}
+    with ThreadPoolExecutor(8) as pool:
+        for future in [pool.submit(write_snapshot, path, "abc", sheets) for _ in range(32)]:
+            future.result()
+    assert load_snapshot(path, "abc") == sheets
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]